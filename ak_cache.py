@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+
+CACHE_DIR = os.getenv("AK_CACHE_DIR", ".cache/akshare")
+MAX_CACHE_BYTES = int(os.getenv("AK_CACHE_MAX_MB", "512")) * 1024 * 1024
+DISABLED = os.getenv("AK_CACHE_DISABLE") == "1"
+
+NEVER = None            # 永不过期
+DATED = 'dated'         # 按 date 参数判断：历史日期永不过期，当天数据按 TODAY_TTL 过期
+TODAY_TTL = 10 * 60
+DEFAULT_TTL = 30 * 60
+
+# 各接口的缓存有效期（秒）
+TTL_POLICIES = {
+    # 实时行情：几分钟内有效
+    'stock_zh_a_spot_em': 5 * 60,
+    'stock_zh_a_spot': 5 * 60,
+    'stock_zh_index_spot_sina': 5 * 60,
+    'stock_zh_index_spot_em': 5 * 60,
+    # 板块行情与成分股：半小时
+    'stock_board_concept_name_em': 30 * 60,
+    'stock_board_concept_cons_em': 30 * 60,
+    'stock_board_industry_summary_ths': 30 * 60,
+    # 个股基本资料几乎不变
+    'stock_individual_basic_info_xq': 7 * 24 * 3600,
+    'stock_individual_info_em': 7 * 24 * 3600,
+    # 按日期查询的历史数据
+    'stock_zt_pool_em': DATED,
+    'stock_zt_pool_dtgc_em': DATED,
+    'stock_zt_pool_zbgc_em': DATED,
+    'stock_lhb_detail_daily_sina': DATED,
+    'stock_lhb_detail_em': DATED,
+}
+
+_BEIJING = timezone(timedelta(hours=8))
+_evict_lock = threading.Lock()
+
+
+def _resolve_ttl(func_name, kwargs):
+    """根据接口和参数得到本次调用结果的有效期（秒），None 表示永不过期"""
+    policy = TTL_POLICIES.get(func_name, DEFAULT_TTL)
+    if policy != DATED:
+        return policy
+    date = kwargs.get('date') or kwargs.get('end_date')
+    today = datetime.now(_BEIJING).strftime("%Y%m%d")
+    if date is not None and str(date) < today:
+        return NEVER
+    return TODAY_TTL
+
+def cache_key(func_name, args, kwargs):
+    """以接口名和参数生成缓存键"""
+    payload = json.dumps([func_name, list(args), sorted(kwargs.items())], ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def _cache_path(func_name, key):
+    return os.path.join(CACHE_DIR, func_name, f"{key}.pkl")
+
+def _read_entry(path):
+    """读取缓存条目，文件不存在或损坏时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # 损坏或版本不兼容的缓存当作未命中
+        return None
+
+def _write_entry(path, entry):
+    """原子写入：先写同目录临时文件再 os.replace，中途失败不会留下半个缓存文件"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def evict(max_bytes=MAX_CACHE_BYTES):
+    """总大小超过上限时按最近访问时间（文件 mtime，命中时会刷新）淘汰，直到降到上限的 90%"""
+    with _evict_lock:
+        entries = []
+        for root, _, files in os.walk(CACHE_DIR):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        if total <= max_bytes:
+            return 0
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+def cached_call(func_name, *args, **kwargs):
+    """带磁盘缓存地调用 ak.<func_name>(*args, **kwargs)；异常不缓存"""
+    import akshare
+
+    func = getattr(akshare, func_name)
+    if DISABLED:
+        return func(*args, **kwargs)
+
+    key = cache_key(func_name, args, kwargs)
+    path = _cache_path(func_name, key)
+    entry = _read_entry(path)
+    if entry is not None:
+        expires_at = entry.get('expires_at')
+        if expires_at is None or time.time() < expires_at:
+            try:
+                os.utime(path)  # 刷新访问时间，用于 LRU 淘汰
+            except FileNotFoundError:
+                pass
+            return entry['value']
+
+    return _call_and_store(func, func_name, path, kwargs, *args)
+
+def refresh_call(func_name, *args, **kwargs):
+    """跳过缓存读取、总是请求上游，并用新结果更新缓存（盘中轮询等必须拿到最新数据的场景）"""
+    import akshare
+
+    func = getattr(akshare, func_name)
+    if DISABLED:
+        return func(*args, **kwargs)
+    return _call_and_store(func, func_name, _cache_path(func_name, cache_key(func_name, args, kwargs)), kwargs, *args)
+
+def _call_and_store(func, func_name, path, kwargs, *args):
+    value = func(*args, **kwargs)
+    ttl = _resolve_ttl(func_name, kwargs)
+    _write_entry(path, {
+        'func': func_name,
+        'created_at': time.time(),
+        'expires_at': None if ttl is None else time.time() + ttl,
+        'value': value,
+    })
+    evict()
+    return value
+
+def invalidate(func_name, *args, **kwargs):
+    """删除某次调用的缓存（例如上游返回了残缺数据，不希望在有效期内被重复使用）"""
+    try:
+        os.remove(_cache_path(func_name, cache_key(func_name, args, kwargs)))
+    except FileNotFoundError:
+        pass
+
+
+class CachedAkshare:
+    """akshare 的缓存代理：cached_ak.stock_zt_pool_em(date=...) 与 ak.stock_zt_pool_em(date=...) 用法一致"""
+
+    def __getattr__(self, func_name):
+        if func_name.startswith('_'):
+            raise AttributeError(func_name)
+
+        def call(*args, **kwargs):
+            return cached_call(func_name, *args, **kwargs)
+
+        call.__name__ = func_name
+        return call
+
+
+cached_ak = CachedAkshare()
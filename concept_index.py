@@ -0,0 +1,253 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from ak_cache import cached_call
+from data_archive import read_json, write_json
+
+
+INDEX_FILE = 'data/concept_index.npz'
+META_FILE = 'data/concept_index_meta.json'
+MAX_AGE_DAYS = 7        # 每个板块的成分股至少每隔多少天重新抓取一次
+MAX_WORKERS = 4         # 并发抓取的上限，避免请求过快被封
+MAX_BOARDS_PER_RUN = 200    # 每次最多刷新的板块数（请求间隔 0.5s，约 100s），其余留到下一个交易日
+CHECKPOINT_EVERY = 50       # 每抓取这么多个板块保存一次索引和元数据，超时被放弃时已抓取的结果不丢失
+
+
+class ConceptIndex:
+    """
+    个股 -> 概念板块的倒排索引，以稀疏矩阵（代码 x 板块）的 CSR / CSC 两种压缩形式保存
+    - codes: 升序的 int32 股票代码；boards: 板块名称
+    - code_ptr / code_boards: 第 i 只股票所属的板块编号为 code_boards[code_ptr[i]:code_ptr[i+1]]
+    - board_ptr / board_codes: 第 j 个板块的成分股行号为 board_codes[board_ptr[j]:board_ptr[j+1]]（升序）
+    查询只涉及一次二分查找和数组切片，为微秒级
+    """
+
+    def __init__(self, codes, boards, code_ptr, code_boards, board_ptr, board_codes):
+        self.codes = codes
+        self.boards = boards
+        self.code_ptr = code_ptr
+        self.code_boards = code_boards
+        self.board_ptr = board_ptr
+        self.board_codes = board_codes
+        self._board_id = {name: i for i, name in enumerate(boards)}
+
+    @classmethod
+    def from_members(cls, members):
+        """由 {板块名称: [代码, ...]} 构建索引"""
+        boards = sorted(members)
+        pairs = [(int(code), board_id) for board_id, board in enumerate(boards) for code in set(members[board])]
+        if not pairs:
+            empty = np.zeros(0, dtype=np.int32)
+            return cls(empty, boards, np.zeros(1, dtype=np.int32), empty, np.zeros(len(boards) + 1, dtype=np.int32), empty)
+        pair_array = np.array(pairs, dtype=np.int32)
+        codes, rows = np.unique(pair_array[:, 0], return_inverse=True)
+        board_ids = pair_array[:, 1]
+
+        # CSR：按 (行, 板块) 排序
+        order = np.lexsort((board_ids, rows))
+        code_ptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(codes)))]).astype(np.int32)
+        code_boards = board_ids[order].astype(np.int32)
+        # CSC：按 (板块, 行) 排序
+        order = np.lexsort((rows, board_ids))
+        board_ptr = np.concatenate([[0], np.cumsum(np.bincount(board_ids, minlength=len(boards)))]).astype(np.int32)
+        board_codes = rows[order].astype(np.int32)
+        return cls(codes.astype(np.int32), boards, code_ptr, code_boards, board_ptr, board_codes)
+
+    @classmethod
+    def load(cls, file_path=INDEX_FILE):
+        """从磁盘加载索引，文件不存在时返回 None"""
+        if not os.path.exists(file_path):
+            return None
+        with np.load(file_path, allow_pickle=False) as data:
+            return cls(data['codes'], data['boards'].tolist(), data['code_ptr'], data['code_boards'],
+                       data['board_ptr'], data['board_codes'])
+
+    def save(self, file_path=INDEX_FILE):
+        """原子写入压缩的 npz 文件"""
+        tmp_path = f"{file_path}.tmp.npz"
+        np.savez_compressed(tmp_path, codes=self.codes, boards=np.array(self.boards, dtype=str),
+                            code_ptr=self.code_ptr, code_boards=self.code_boards,
+                            board_ptr=self.board_ptr, board_codes=self.board_codes)
+        os.replace(tmp_path, file_path)
+
+    def _row(self, code):
+        key = int(str(code)[-6:])
+        pos = int(np.searchsorted(self.codes, key))
+        return pos if pos < len(self.codes) and self.codes[pos] == key else None
+
+    def boards_of(self, code):
+        """某只股票所属的全部概念板块"""
+        row = self._row(code)
+        if row is None:
+            return []
+        return [self.boards[b] for b in self.code_boards[self.code_ptr[row]:self.code_ptr[row + 1]]]
+
+    def members_of(self, board):
+        """某个板块的全部成分股代码"""
+        board_id = self._board_id.get(board)
+        if board_id is None:
+            return []
+        rows = self.board_codes[self.board_ptr[board_id]:self.board_ptr[board_id + 1]]
+        return [f"{code:06d}" for code in self.codes[rows]]
+
+    def overlap(self, board_a, board_b):
+        """两个板块共同的成分股代码（两个有序数组求交集）"""
+        ids = [self._board_id.get(board_a), self._board_id.get(board_b)]
+        if None in ids:
+            return []
+        a, b = (self.board_codes[self.board_ptr[i]:self.board_ptr[i + 1]] for i in ids)
+        common = np.intersect1d(a, b, assume_unique=True)
+        return [f"{code:06d}" for code in self.codes[common]]
+
+    def to_members(self):
+        """还原为 {板块名称: [代码, ...]}"""
+        return {board: self.members_of(board) for board in self.boards}
+
+    def __repr__(self):
+        return f"ConceptIndex(codes={len(self.codes)}, boards={len(self.boards)}, links={len(self.code_boards)})"
+
+
+def hot_boards_of(index, code, ranking, limit=3):
+    """某只股票所属板块中，按当日涨幅排名最靠前的 limit 个"""
+    order = {board: i for i, board in enumerate(ranking)}
+    boards = sorted(index.boards_of(code), key=lambda b: order.get(b, len(order)))
+    return boards[:limit]
+
+def load_meta(file_path=META_FILE):
+    return read_json(file_path, {'boards': {}})
+
+def save_meta(meta, file_path=META_FILE):
+    write_json(meta, file_path, indent=1)
+
+def select_stale_boards(board_summary_df, meta, today, max_age_days=MAX_AGE_DAYS):
+    """
+    选出需要重新抓取成分股的板块：
+    - 新出现的板块
+    - 今日上涨+下跌家数超过已知成分股数量（必然有新纳入的成分股）
+    - 距上次抓取超过 max_age_days 天（兜底轮换，捕捉调出的成分股）
+    返回的板块按优先级排序：新板块、成分股增加的板块在前，其余按上次抓取时间从旧到新
+    """
+    stale, expired = [], []
+    today_dt = datetime.strptime(today, "%Y%m%d")
+    for _, row in board_summary_df.iterrows():
+        board = row['板块名称']
+        info = meta['boards'].get(board)
+        if info is None:
+            stale.append(board)
+            continue
+        active = pd.to_numeric(row.get('上涨家数'), errors='coerce') + pd.to_numeric(row.get('下跌家数'), errors='coerce')
+        if pd.notna(active) and active > info['size']:
+            stale.append(board)
+            continue
+        if (today_dt - datetime.strptime(info['fetched'], "%Y%m%d")).days >= max_age_days:
+            expired.append(board)
+    return stale + sorted(expired, key=lambda b: meta['boards'][b]['fetched'])
+
+def fetch_board_members(boards, max_workers=MAX_WORKERS, min_interval=0.5, on_result=None, deadline=None):
+    """
+    有界并发地抓取多个板块的成分股，返回 ({板块: [代码]}, {板块: 异常})
+    on_result(板块, 代码列表): 每个板块抓取成功后立即回调（在调用线程中执行），用于保存中间进度
+    deadline: time.monotonic() 截止时刻，到期后取消尚未发出的请求并返回已抓取的部分
+    （线程池在解释器退出时会等待所有已提交的任务，不取消的话超时阶段会一直请求到作业被强制结束）
+    """
+    lock = threading.Lock()
+    last_request = [0.0]
+
+    def fetch(board):
+        # 全局限速：任意两次请求之间至少间隔 min_interval 秒
+        with lock:
+            wait = last_request[0] + min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            last_request[0] = time.monotonic()
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError("已到截止时间")
+        df = cached_call('stock_board_concept_cons_em', symbol=board)
+        return df['代码'].astype(str).str.zfill(6).tolist()
+
+    members, errors = {}, {}
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(fetch, board): board for board in boards}
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        for future in as_completed(futures, timeout=timeout):
+            board = futures[future]
+            try:
+                members[board] = future.result()
+            except Exception as e:
+                errors[board] = e
+                continue
+            if on_result is not None:
+                on_result(board, members[board])
+    except TimeoutError:
+        print(f"⏱️ 抓取板块成分股已到截止时间，完成 {len(members)}/{len(boards)} 个，其余留到下次刷新")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return members, errors
+
+def refresh_concept_index(date, index_path=INDEX_FILE, meta_path=META_FILE, max_age_days=MAX_AGE_DAYS,
+                          max_workers=MAX_WORKERS, max_boards=MAX_BOARDS_PER_RUN, deadline=None):
+    """
+    增量刷新倒排索引：只重新抓取成分股可能变化的板块，已下线的板块从索引中移除
+    - 每次最多刷新 max_boards 个板块（按优先级），首次全量构建分摊到多个交易日完成
+    - 每抓取 CHECKPOINT_EVERY 个板块保存一次，阶段超时被放弃时，重跑只需抓取剩余的板块
+    - 到达 deadline（time.monotonic() 时刻）后停止抓取，用已抓取的板块保存索引
+    """
+    board_summary_df = cached_call('stock_board_concept_name_em')
+    index = ConceptIndex.load(index_path)
+    members = index.to_members() if index is not None else {}
+    meta = load_meta(meta_path)
+
+    live_boards = set(board_summary_df['板块名称'])
+    for board in set(members) - live_boards:
+        members.pop(board, None)
+        meta['boards'].pop(board, None)
+
+    stale = select_stale_boards(board_summary_df, meta, date, max_age_days=max_age_days)
+    print(f"🔄 概念板块共 {len(live_boards)} 个，需要刷新成分股的板块 {len(stale)} 个"
+          + (f"，本次刷新前 {max_boards} 个" if len(stale) > max_boards else ''))
+    stale = stale[:max_boards]
+
+    changed = [0]
+
+    def on_result(board, codes):
+        if sorted(codes) != sorted(members.get(board, [])):
+            changed[0] += 1
+        members[board] = codes
+        meta['boards'][board] = {'size': len(codes), 'fetched': date}
+        done = sum(1 for info in meta['boards'].values() if info['fetched'] == date)
+        if done % CHECKPOINT_EVERY == 0:
+            ConceptIndex.from_members(members).save(index_path)
+            save_meta(meta, meta_path)
+            print(f"💾 概念倒排索引已保存中间进度（今日已刷新 {done} 个板块）")
+
+    _, errors = fetch_board_members(stale, max_workers=max_workers, on_result=on_result, deadline=deadline)
+    for board, error in errors.items():
+        print(f"⚠️ 获取板块 {board} 成分股失败: {error}")
+
+    index = ConceptIndex.from_members(members)
+    index.save(index_path)
+    meta['updated'] = date
+    # 当日板块涨幅排名，用于给个股标注“今日最热的所属概念”
+    meta['ranking'] = board_summary_df.sort_values('排名')['板块名称'].tolist() \
+        if '排名' in board_summary_df.columns else board_summary_df['板块名称'].tolist()
+    save_meta(meta, meta_path)
+    print(f"✅ 概念倒排索引已更新: {index}，成分股有变化的板块 {changed[0]} 个")
+    return index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="刷新 个股 -> 概念板块 倒排索引")
+    parser.add_argument('--date', default=datetime.now().strftime("%Y%m%d"))
+    parser.add_argument('--max-age-days', type=int, default=MAX_AGE_DAYS)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--max-boards', type=int, default=MAX_BOARDS_PER_RUN, help='本次最多刷新的板块数')
+    args = parser.parse_args()
+    refresh_concept_index(args.date, max_age_days=args.max_age_days, max_workers=args.workers,
+                          max_boards=args.max_boards)
@@ -0,0 +1,223 @@
+import argparse
+import functools
+import io
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+
+ARCHIVE_DIR = 'archive'         # data/archive/<YYYYMMDD>/<数据集>.parquet，只存放体积较大的数据集
+MANIFEST_FILE = 'manifest.json'
+PACK_MIN_BYTES = 64 * 1024      # 超过该大小的 CSV 才打包；小文件的 parquet 元数据（约 8KB）比 git 自身的 zlib 压缩结果还大
+MAX_DECIMALS = 6               # 数值列按定点整数存储时允许的最大小数位数
+
+_DATE_DIR_PATTERN = re.compile(r'^\d{8}$')
+_FILE_PATTERN = re.compile(r'^(?P<name>.+)_(?P<date>\d{8})\.(?P<ext>csv|md)$')
+
+
+def code_key(codes):
+    """统一代码格式：去掉新浪源的 sh/sz/bj 前缀，补齐 6 位（接受 Series 或任意代码序列，返回 Series）"""
+    return pd.Series(codes, dtype=str).str[-6:].str.zfill(6)
+
+def read_json(file_path, default):
+    """读取 JSON 文件，不存在时返回 default"""
+    if not os.path.exists(file_path):
+        return default
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def write_json(data, file_path, indent=None):
+    """原子写入 JSON 文件；默认紧凑格式，indent 不为 None 时按缩进格式写入便于阅读和 diff"""
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    separators = (',', ':') if indent is None else None
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent, separators=separators, sort_keys=True)
+    os.replace(tmp_path, file_path)
+
+def parse_data_path(file_path):
+    """将 data/<date>/<数据集>_<date>.csv 拆成 (data_root, date, 数据集, 扩展名)，不匹配时返回 None"""
+    match = _FILE_PATTERN.match(os.path.basename(file_path))
+    if match is None:
+        return None
+    date_dir = os.path.dirname(file_path)
+    if os.path.basename(date_dir) != match.group('date'):
+        return None
+    return os.path.dirname(date_dir) or '.', match.group('date'), match.group('name'), match.group('ext')
+
+def archive_day_dir(date, data_root='data'):
+    return os.path.join(data_root, ARCHIVE_DIR, date)
+
+def _loose_date_dirs(data_root='data'):
+    """data/<date> 散装目录"""
+    return sorted(d for d in os.listdir(data_root)
+                  if _DATE_DIR_PATTERN.match(d) and os.path.isdir(os.path.join(data_root, d)))
+
+@functools.lru_cache(maxsize=64)
+def _read_manifest(manifest_path, mtime):
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_manifest(date, data_root='data'):
+    """读取某一天归档的清单，不存在时返回 None"""
+    manifest_path = os.path.join(archive_day_dir(date, data_root), MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    return _read_manifest(manifest_path, os.path.getmtime(manifest_path))
+
+def list_available_dates(data_root='data'):
+    """列出本地所有可用的数据日期（散装目录 + 归档），升序"""
+    dates = set()
+    if os.path.isdir(data_root):
+        dates.update(_loose_date_dirs(data_root))
+    archive_root = os.path.join(data_root, ARCHIVE_DIR)
+    if os.path.isdir(archive_root):
+        dates.update(d for d in os.listdir(archive_root) if load_manifest(d, data_root) is not None)
+    return sorted(dates)
+
+def load_archived_csv(file_path):
+    """
+    按 load_local_csv 的路径约定从归档读取数据，找不到时返回 None
+    读出后再走一遍 read_csv，保证类型推断与读取散装 CSV 完全一致
+    """
+    parsed = parse_data_path(file_path)
+    if parsed is None or parsed[3] != 'csv':
+        return None
+    data_root, date, name, _ = parsed
+    manifest = load_manifest(date, data_root)
+    dataset = None if manifest is None else manifest['datasets'].get(name)
+    if dataset is None:
+        return None
+    rows = pd.read_parquet(os.path.join(archive_day_dir(date, data_root), f"{name}.parquet"))
+    for col, scale in dataset['scales'].items():
+        if scale:
+            rows[col] = rows[col].astype(np.float64) / 10 ** scale
+    buffer = io.StringIO()
+    rows[dataset['columns']].to_csv(buffer, index=False)
+    buffer.seek(0)
+    return pd.read_csv(buffer, dtype={'代码': str})
+
+def load_local_csv(file_path=""):
+    """从本地 CSV 文件加载数据，散装文件不存在时回退到归档，都没有时返回 None"""
+    if os.path.exists(file_path):
+        return pd.read_csv(file_path, dtype={'代码': str}) # 强制代码列为字符串，防止 000001 变成 1
+    return load_archived_csv(file_path)
+
+def load_local_text(file_path):
+    """读取本地 Markdown 文本（Markdown 文件体积小，不打包，始终是散装文件），不存在时返回 None"""
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def _read_raw_csv(file_path):
+    """以全字符串方式读取散装 CSV，空值保持为空字符串，保证归档无损"""
+    return pd.read_csv(file_path, dtype=str, keep_default_na=False, na_filter=False, encoding='utf-8-sig')
+
+def _pack_column(series):
+    """
+    尽量把原始字符串列还原为整数列以提高压缩率，返回 (列, 小数位数)：
+    - 整数列直接存 Int64；有限位小数的列按 10^k 放大后存 Int64，读取时再除回去
+    - 只有当还原后的数值格式化回字符串与原文逐字一致时才转换（如 '093050' 这类带前导零的列保持字符串），保证归档无损
+    """
+    raw = series.fillna('').astype(str)
+    mask = raw != ''
+    try:
+        # 逐个按 Python float 精确解析（pd.to_numeric 的快速解析在末位可能有 1ulp 误差）
+        values = raw[mask].astype(np.float64).to_numpy()
+    except ValueError:
+        return raw, None
+    text = raw[mask].to_numpy()
+    for scale in range(MAX_DECIMALS + 1):
+        scaled = np.round(values * 10 ** scale)
+        if not np.isfinite(scaled).all() or np.abs(scaled).max(initial=0) >= 2 ** 53:
+            break
+        # 小数位为 0 时按整数格式比较，其余按 float 格式比较（'674922.0' 会落在 1 位小数上）
+        if scale == 0:
+            candidate = [str(v) for v in scaled.astype(np.int64)]
+        else:
+            candidate = [repr(v) for v in (scaled / 10 ** scale).tolist()]
+        if (np.array(candidate, dtype=object) == text).all():
+            packed = pd.Series(pd.NA, index=raw.index, dtype='Int64')
+            packed[mask] = scaled.astype(np.int64)
+            return packed, scale
+    return raw, None
+
+def compact_day(date, data_root='data', min_bytes=PACK_MIN_BYTES):
+    """
+    把某一天散装目录中体积较大的 CSV（主要是约 870KB 的全市场快照）打包为 zstd 压缩的 parquet，
+    校验可无损读回后删除散装文件；小文件保留为散装 CSV / Markdown，由 git 自身压缩和增量存储
+    每份数据在仓库里只以一种形式提交一次，打包结果不会再被合并或改写
+    """
+    date_dir = os.path.join(data_root, date)
+    targets = []
+    for file_name in sorted(os.listdir(date_dir)):
+        match = _FILE_PATTERN.match(file_name)
+        file_path = os.path.join(date_dir, file_name)
+        if match and match.group('date') == date and match.group('ext') == 'csv' \
+                and os.path.getsize(file_path) >= min_bytes:
+            targets.append((match.group('name'), file_path))
+    if not targets:
+        return []
+
+    day_dir = archive_day_dir(date, data_root)
+    os.makedirs(day_dir, exist_ok=True)
+    manifest = dict(load_manifest(date, data_root) or {'datasets': {}})
+    manifest['datasets'] = dict(manifest['datasets'])
+    for name, file_path in targets:
+        rows = _read_raw_csv(file_path)
+        packed = pd.DataFrame(index=rows.index)
+        scales = {}
+        for col in rows.columns:
+            packed[col], scale = _pack_column(rows[col])
+            if scale is not None:
+                scales[col] = scale
+        # 字符串列用字典编码；定点整数列用 BYTE_STREAM_SPLIT，高基数数值做字典编码反而更大
+        text_columns = [c for c in packed.columns if c not in scales]
+        parquet_path = os.path.join(day_dir, f"{name}.parquet")
+        tmp_path = f"{parquet_path}.tmp"
+        packed.to_parquet(tmp_path, index=False, engine='pyarrow', compression='zstd', compression_level=19,
+                          use_dictionary=text_columns,
+                          column_encoding={c: 'BYTE_STREAM_SPLIT' for c in scales})
+        os.replace(tmp_path, parquet_path)
+        manifest['datasets'][name] = {'columns': list(rows.columns), 'scales': scales}
+    write_json(manifest, os.path.join(day_dir, MANIFEST_FILE), indent=1)
+
+    # 校验归档可读回与原文件一致后，再删除散装文件
+    for name, file_path in targets:
+        original = pd.read_csv(file_path, dtype={'代码': str})
+        restored = load_archived_csv(file_path)
+        if restored is None or not original.equals(restored):
+            raise RuntimeError(f"归档校验失败: {file_path}")
+        os.remove(file_path)
+    if not os.listdir(date_dir):
+        os.rmdir(date_dir)
+
+    print(f"✅ {date} 已打包 {len(targets)} 个数据集: {day_dir}")
+    return [name for name, _ in targets]
+
+def compact_all(data_root='data', min_bytes=PACK_MIN_BYTES):
+    """打包所有散装目录中尚未打包的大文件（已打包的日期没有大文件，直接跳过）"""
+    packed = {}
+    for date in _loose_date_dirs(data_root):
+        names = compact_day(date, data_root=data_root, min_bytes=min_bytes)
+        if names:
+            packed[date] = names
+    return packed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将 data/<date> 目录中的大文件打包为压缩的列式归档 data/archive/<date>/")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compact_parser = subparsers.add_parser('compact', help='打包大文件')
+    compact_parser.add_argument('--date', help='只打包该交易日 YYYYMMDD，默认打包所有散装目录')
+    compact_parser.add_argument('--data-root', default='data')
+    compact_parser.add_argument('--min-bytes', type=int, default=PACK_MIN_BYTES, help='超过该大小的 CSV 才打包')
+    args = parser.parse_args()
+
+    if args.date:
+        compact_day(args.date, data_root=args.data_root, min_bytes=args.min_bytes)
+    else:
+        compact_all(data_root=args.data_root, min_bytes=args.min_bytes)
@@ -1,13 +1,42 @@
-import akshare as ak
 import pandas as pd
 from datetime import datetime, timedelta
 import os
 import time
-import pytz
-from google import genai
+import argparse
 
 import warnings
 
+from ak_cache import cached_ak as ak  # 所有 ak.* 调用都经过磁盘缓存（按接口设置有效期）
+from data_archive import code_key, list_available_dates, load_local_csv, load_local_text
+from stock_scoring import score_stocks
+from snapshot_sources import fetch_snapshot_hedged, missing_fields
+from concept_index import ConceptIndex, hot_boards_of, load_meta, refresh_concept_index
+from stage_runner import StageRunner
+from report_charts import build_chart_data, chart_markdown, render_charts
+
+
+# 各阶段的时间预算（秒），超时后放弃该阶段，用缓存/部分数据继续，保证每日任务按时结束
+STAGE_BUDGETS = {
+    '最新交易日': 120,
+    '大盘指数': 60,
+    '涨跌停池': 90,
+    '全市场快照': 240,
+    '成交额榜': 180,
+    '概念板块': 60,
+    '概念成分股': 120,
+    '龙虎榜': 60,
+    '概念倒排索引': 300,
+    '重点个股': 60,
+    '全市场评分': 60,
+    '昨日对比': 60,
+    '图表': 120,
+    '个股档案': 120,
+    '搜索索引': 60,
+    'AI 分析': 240,
+    'Hugo 博客': 30,
+}
+PIPELINE_BUDGET = 25 * 60   # 数据抓取阶段的总预算（秒），AI 分析与生成博客另按自身预算执行
+GEMINI_TIMEOUT = 180        # Gemini 请求超时（秒）
 
 # 忽略特定的 DeprecationWarning
 # warnings.filterwarnings("ignore", category=UserWarning, module="py_mini_racer")
@@ -15,16 +44,6 @@ import warnings
 warnings.filterwarnings("ignore")
 
 
-def load_local_csv(file_path=""):
-    """从本地 CSV 文件加载数据"""
-    if os.path.exists(file_path):
-        # print(f"📂 发现本地缓存，正在读取: {file_path}")
-        df = pd.read_csv(file_path, dtype={'代码': str}) # 强制代码列为字符串，防止 000001 变成 1
-        return df
-    else:
-        # print(f"⚠️ 本地文件不存在: {file_path}")
-        return None
-
 def transfer_value(value):
     """将数值转换为亿元或万元的字符串表示"""
     if pd.isna(value):
@@ -178,8 +197,20 @@ def stock_zt_dt_pool(date="20260213", save_dir='data'):
     
     return zt_pool_df, dt_pool_df, zb_pool_df
 
-def fetch_all_stock_data(date='20260213', save_dir='data', max_retries=3):
-    """尝试抓取所有股票数据，失败则重试"""
+def count_breadth(df):
+    """计算上涨、下跌、持平的个股数"""
+    df['涨跌'] = df['涨跌幅'].apply(lambda x: 1 if x > 0 else (-1 if x < 0 else 0))
+    up_count = df[df['涨跌'] == 1].shape[0]
+    down_count = df[df['涨跌'] == -1].shape[0]
+    flat_count = df[df['涨跌'] == 0].shape[0]
+    return up_count, down_count, flat_count
+
+def fetch_all_stock_data(date='20260213', save_dir='data', max_retries=3, hedge_after=3.0):
+    """
+    抓取所有股票数据，失败则重试
+    每次抓取都是对冲请求：东方财富（数据最全）为主，超过 hedge_after 秒未返回则同时请求新浪（云服务器上更稳定），
+    两者都统一为东方财富字段，新浪缺少的字段显式为空
+    """
     file_path = f"{save_dir}/A_stock_{date}.csv"
 
     df = load_local_csv(file_path)
@@ -188,34 +219,26 @@ def fetch_all_stock_data(date='20260213', save_dir='data', max_retries=3):
         for i in range(max_retries):
             try:
                 print(f"尝试第 {i+1} 次抓取...")
-                # 核心接口
-                if i % 2 == 0:
-                    # 首选：东方财富实时接口（数据最全，含代码、名称、涨跌幅、成交额等）
-                    df = ak.stock_zh_a_spot_em()
-                elif i % 2 == 1:
-                    # 备选 1：新浪接口（在云服务器上极其稳定，虽数据字段略少，但基本行情都有）
-                    print("⚠️ 尝试使用新浪稳健接口...")
-                    df = ak.stock_zh_a_spot()
-                
-                if df is not None and not df.empty:
-                    df.to_csv(file_path, index=False, encoding="utf-8-sig")
-                    print("✅ 数据抓取成功！")
-                    print(f"💾 数据已存至: {file_path}")
-                    sucess = True
-                    break
+                df = fetch_snapshot_hedged(primary='em', secondary='sina', hedge_after=hedge_after)
+                df.to_csv(file_path, index=False, encoding="utf-8-sig")
+                print("✅ 数据抓取成功！")
+                print(f"💾 数据已存至: {file_path}")
+                sucess = True
+                break
             except Exception as e:
                 print(f"⚠️ 第 {i+1} 次抓取异常: {e}")
-                time.sleep(5) # 等 5 秒再试
+                time.sleep(2) # 等 2 秒再试
         if not sucess:
             print("❌ 所有重试均失败。")
             # exit(1)
             return None, None, None, None
+
+    missing = missing_fields(df)
+    if missing:
+        print(f"⚠️ 当前快照来自备用数据源，以下字段缺失: {missing}")
     
     # 计算涨跌个数
-    df['涨跌'] = df['涨跌幅'].apply(lambda x: 1 if x > 0 else (-1 if x < 0 else 0))
-    up_count = df[df['涨跌'] == 1].shape[0]
-    down_count = df[df['涨跌'] == -1].shape[0]
-    flat_count = df[df['涨跌'] == 0].shape[0]
+    up_count, down_count, flat_count = count_breadth(df)
 
     print("-" * 30)
     print(f"📈 上涨股数: {up_count}, 📉 下跌股数: {down_count}, 📊 持平股数: {flat_count}")
@@ -403,14 +426,42 @@ def get_concept_cons(df, date="20260213", save_dir='data', top_n=15):
                 time.sleep(0.5) # 避免请求过快被封
         except Exception as e:
             print(f"⚠️ 获取概念板块成分股数据失败: {e}")
-            return None
+            return [], []
     
+    if not all_concept_cons_topn:
+        return [], []
+
     print("-" * 30)
     all_concept_cons_df = pd.concat(all_concept_cons_topn, ignore_index=True)
     print(all_concept_cons_df)
     print("-" * 30)
     return all_concept_cons, all_concept_cons_topn
 
+def get_concept_index(date="20260213", deadline=None):
+    """获取 个股 -> 概念板块 倒排索引（覆盖全部东方财富概念板块），每个交易日只增量刷新一次"""
+    meta = load_meta()
+    concept_index = ConceptIndex.load()
+    if concept_index is None or meta.get('updated') != date:
+        try:
+            concept_index = refresh_concept_index(date, deadline=deadline)
+            meta = load_meta()
+        except Exception as e:
+            print(f"⚠️ 刷新概念倒排索引失败，使用已有索引: {e}")
+    if concept_index is None:
+        return None, []
+
+    print("-" * 30)
+    print(f"📚 概念倒排索引: {concept_index}（更新日期: {meta.get('updated')}）")
+    print("-" * 30)
+    return concept_index, meta.get('ranking', [])
+
+def tag_concepts(df, concept_index, ranking, limit=3):
+    """为个股加上“所属概念”列：按当日涨幅排名取其所属板块中最热的 limit 个"""
+    if df is None or df.empty or concept_index is None:
+        return df
+    df['所属概念'] = ['、'.join(hot_boards_of(concept_index, code, ranking, limit=limit)) for code in df['代码']]
+    return df
+
 def get_lhb_data(date="20260213", save_dir='data'):
     """获取龙虎榜数据"""
     file_path = f"{save_dir}/lhb_{date}.csv"
@@ -447,12 +498,15 @@ def get_watchlist(top_amount_stocks_df,
                     lhb_df,
                     concept_cons,
                     date="20260213",
-                    save_dir='data'
+                    save_dir='data',
+                    concept_index=None,
+                    concept_ranking=None
                 ):
     """
     获取精确属性的重点个股信息
     watchlist1 (大额异动池): 成交额前二十，且在涨/跌/炸停板上、或者在龙虎榜上、或者在涨幅前五的行业板块里的个股
     watchlist2 (风口涨停池): 涨停/炸板，且在涨幅前五的行业板块里的个股
+    有概念倒排索引时，watchlist1 按前五板块的完整成分股匹配，并附上每只股票“所属概念”中当日最热的几个
     """
     file_path1 = f"{save_dir}/watchlist1_{date}.csv"
     file_path2 = f"{save_dir}/watchlist2_{date}.csv"
@@ -477,6 +531,13 @@ def get_watchlist(top_amount_stocks_df,
             name_col = '名称' if '名称' in df.columns else '股票名称'
             top_5_member_names.update(df[name_col].tolist())
 
+    # 有倒排索引时，用前五板块的完整成分股（而不仅是涨幅前 top_n 的成分股）按代码匹配
+    top_5_member_codes = set()
+    if concept_index is not None:
+        for df in concept_cons[:5]:
+            if not df.empty and '所属板块' in df.columns:
+                top_5_member_codes.update(concept_index.members_of(df['所属板块'].iloc[0]))
+
     # --- 2. 准备其他异动池名称 ---
     zt_names = set(zt_pool_df['名称']) if not zt_pool_df.empty else set()
     zb_names = set(zb_pool_df['名称']) if not zb_pool_df.empty else set()
@@ -492,9 +553,11 @@ def get_watchlist(top_amount_stocks_df,
         top_amount_stocks_df['名称'].isin(dt_names) |
         top_amount_stocks_df['名称'].isin(zb_names) |
         top_amount_stocks_df['名称'].isin(lhb_names) |
-        top_amount_stocks_df['名称'].isin(top_5_member_names)
+        top_amount_stocks_df['名称'].isin(top_5_member_names) |
+        top_amount_stocks_df['代码'].astype(str).str[-6:].isin(top_5_member_codes)
     )
     watchlist1_df = top_amount_stocks_df[w1_mask].copy()
+    tag_concepts(watchlist1_df, concept_index, concept_ranking or [])
 
     # --- 4. 构造 Watchlist 2 ---
     # 逻辑：将涨停池和炸板池合并，提取它们的属性
@@ -546,8 +609,188 @@ def get_watchlist(top_amount_stocks_df,
 
     return watchlist1_df, watchlist2_df
 
-def create_hugo_post(market_summary, ai_analysis, save_dir='content/posts'):
-    """生成 Hugo 博客的 Markdown 内容"""
+def get_score_watchlist(all_stocks_df,
+                        zt_pool_df,
+                        concept_cons,
+                        date="20260213",
+                        save_dir='data',
+                        top_k=20,
+                        weights=None
+                    ):
+    """
+    获取全市场多因子评分的重点个股信息
+    watchlist3 (全市场评分池): 对全部 A 股按成交额排名、量比、换手率、涨速、涨跌幅、60日涨跌幅、涨停状态、概念板块成员加权打分，取前 K
+    """
+    file_path = f"{save_dir}/watchlist3_{date}.csv"
+
+    watchlist3_df = load_local_csv(file_path)
+    if watchlist3_df is None:
+        try:
+            limit_up_codes = zt_pool_df['代码'].tolist() if zt_pool_df is not None and not zt_pool_df.empty else []
+            concept_codes = [code for df in (concept_cons or []) if not df.empty for code in df['代码']]
+
+            start = time.perf_counter()
+            scored_df = score_stocks(all_stocks_df, limit_up_codes, concept_codes, weights=weights, top_k=top_k)
+            print(f"⏱️ 全市场评分耗时: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+            scored_df['成交额(亿元)'] = scored_df['成交额'].apply(transfer_value)
+            output_cols = ['代码', '名称', '最新价', '涨跌幅', '成交额(亿元)', '量比', '换手率', '60日涨跌幅', '涨停', '概念', '综合得分']
+            watchlist3_df = scored_df[[c for c in output_cols if c in scored_df.columns]].copy()
+            watchlist3_df['涨停'] = watchlist3_df['涨停'].map({True: '是', False: ''})
+            watchlist3_df['概念'] = watchlist3_df['概念'].map({True: '是', False: ''})
+            watchlist3_df.insert(0, '序号', range(1, len(watchlist3_df) + 1))
+        except Exception as e:
+            print(f"⚠️ 获取全市场评分数据失败: {e}")
+            return None
+
+        watchlist3_df.to_csv(file_path, index=False, encoding="utf-8-sig")
+
+    print("-" * 30)
+    print("Watchlist 3 (全市场评分池):")
+    print(watchlist3_df)
+    print("-" * 30)
+    return watchlist3_df
+
+def get_previous_date(date="20260213", data_root='data'):
+    """获取本地已缓存（散装目录或月度归档）的上一个交易日日期"""
+    earlier_dates = [d for d in list_available_dates(data_root) if d < date]
+    return earlier_dates[-1] if earlier_dates else None
+
+def get_daily_diff(all_stocks_df,
+                    top_amount_stocks_df,
+                    zt_pool_df,
+                    watchlist1_df,
+                    watchlist2_df,
+                    date="20260213",
+                    save_dir='data'
+                ):
+    """
+    与上一交易日对比，直接复用本地缓存的上一交易日数据，不重新抓取
+    - 成交额榜：新进 / 退出 / 留榜（排名变化）
+    - 重点池留存：今日与昨日均在 watchlist 中的个股
+    - 连板晋级 / 断板：昨日涨停今日继续涨停 / 未能涨停
+    - 量能倍数：今日成交额 / 昨日成交额（两日全市场快照按代码哈希连接对齐）
+    """
+    file_path = f"{save_dir}/daily_diff_{date}.csv"
+
+    diff_df = load_local_csv(file_path)
+    if diff_df is not None:
+        print("-" * 30)
+        print("昨日对比:")
+        print(diff_df)
+        print("-" * 30)
+        return diff_df
+
+    data_root = os.path.dirname(save_dir) or '.'
+    prev_date = get_previous_date(date=date, data_root=data_root)
+    if prev_date is None:
+        print("⚠️ 本地没有上一交易日数据，跳过昨日对比")
+        return None
+    prev_dir = f"{data_root}/{prev_date}"
+    prev_stocks_df = load_local_csv(f"{prev_dir}/A_stock_{prev_date}.csv")
+    prev_top_df = load_local_csv(f"{prev_dir}/top_amount_stocks_{prev_date}.csv")
+    prev_zt_df = load_local_csv(f"{prev_dir}/zt_pool_{prev_date}.csv")
+    prev_watchlist_dfs = [load_local_csv(f"{prev_dir}/watchlist{i}_{prev_date}.csv") for i in (1, 2)]
+
+    try:
+        # --- 1. 今/昨全市场快照按代码对齐 ---
+        snapshot_cols = ['代码', '名称', '涨跌幅', '成交额']
+        today = pd.DataFrame(columns=snapshot_cols) if all_stocks_df is None else all_stocks_df[snapshot_cols].copy()
+        prev = pd.DataFrame(columns=snapshot_cols) if prev_stocks_df is None else prev_stocks_df[snapshot_cols].copy()
+        today['代码'] = code_key(today['代码'])
+        prev['代码'] = code_key(prev['代码'])
+        aligned = today.merge(prev, on='代码', how='outer', suffixes=('', '_昨')).set_index('代码')
+        aligned['名称'] = aligned['名称'].fillna(aligned['名称_昨'])
+        aligned['量能倍数'] = (aligned['成交额'] / aligned['成交额_昨']).round(2)
+
+        def codes_of(df):
+            if df is None or df.empty:
+                return []
+            return code_key(df['代码']).tolist()
+
+        def rank_of(df):
+            return {code: rank for rank, code in enumerate(codes_of(df), start=1)}
+
+        records = []
+
+        def add_records(change_type, codes, notes):
+            if not codes:
+                return
+            part = aligned.reindex(codes)
+            part.index.name = '代码'
+            part = part.reset_index()
+            part.insert(0, '变化类型', change_type)
+            part['备注'] = [notes.get(code) for code in part['代码']]
+            records.append(part)
+
+        # --- 2. 成交额榜新进 / 退出 / 留榜 ---
+        today_rank = rank_of(top_amount_stocks_df)
+        prev_rank = rank_of(prev_top_df)
+        add_records('新进成交额榜', [c for c in today_rank if c not in prev_rank],
+                    {c: f"第{r}名" for c, r in today_rank.items()})
+        add_records('成交额榜留榜', [c for c in today_rank if c in prev_rank],
+                    {c: f"第{prev_rank[c]}名 → 第{r}名" for c, r in today_rank.items() if c in prev_rank})
+        add_records('退出成交额榜', [c for c in prev_rank if c not in today_rank],
+                    {c: f"昨日第{r}名" for c, r in prev_rank.items()})
+
+        # --- 3. 重点池留存 ---
+        today_watch = list(dict.fromkeys(codes_of(watchlist1_df) + codes_of(watchlist2_df)))
+        prev_watch = set(codes_of(prev_watchlist_dfs[0]) + codes_of(prev_watchlist_dfs[1]))
+        add_records('重点池留存', [c for c in today_watch if c in prev_watch], {})
+
+        # --- 4. 连板晋级 / 断板 ---
+        today_zt = codes_of(zt_pool_df)
+        prev_zt = codes_of(prev_zt_df)
+        today_zt_stat = dict(zip(today_zt, zt_pool_df['涨停统计'])) if today_zt else {}
+        prev_zt_stat = dict(zip(prev_zt, prev_zt_df['涨停统计'])) if prev_zt else {}
+        add_records('连板晋级', [c for c in today_zt if c in prev_zt], today_zt_stat)
+        add_records('断板', [c for c in prev_zt if c not in set(today_zt)],
+                    {c: f"昨日{s}" for c, s in prev_zt_stat.items()})
+
+        if records:
+            diff_df = pd.concat(records, ignore_index=True)
+        else:
+            diff_df = pd.DataFrame(columns=['变化类型', '代码'] + list(aligned.columns) + ['备注'])
+        diff_df['今日成交额(亿元)'] = diff_df['成交额'].apply(transfer_value)
+        diff_df['昨日成交额(亿元)'] = diff_df['成交额_昨'].apply(transfer_value)
+        diff_df = diff_df.rename(columns={'涨跌幅': '今日涨跌幅', '涨跌幅_昨': '昨日涨跌幅'})
+        diff_df = diff_df[['变化类型', '代码', '名称', '今日涨跌幅', '今日成交额(亿元)',
+                           '昨日涨跌幅', '昨日成交额(亿元)', '量能倍数', '备注']]
+        diff_df.insert(0, '序号', range(1, len(diff_df) + 1))
+    except Exception as e:
+        print(f"⚠️ 生成昨日对比数据失败: {e}")
+        return None
+
+    print("-" * 30)
+    print(f"昨日对比（对比日期: {prev_date}）:")
+    print(diff_df)
+    print("-" * 30)
+
+    diff_df.to_csv(file_path, index=False, encoding="utf-8-sig")
+
+    return diff_df
+
+def get_report_charts(date, index_df, all_stocks_df, zt_pool_df, dt_pool_df, concept_summary_df, top_amount_stocks_df,
+                      deadline=None):
+    """绘制涨跌分布、连板梯队、概念热度、成交额榜图表和公众号封面（按数据哈希缓存），返回 {图表名: 文件路径}"""
+    chart_data = build_chart_data(
+        date,
+        index_df=index_df,
+        all_stocks_df=all_stocks_df,
+        zt_pool_df=zt_pool_df,
+        dt_pool_df=dt_pool_df,
+        concept_summary_df=concept_summary_df,
+        top_amount_stocks_df=top_amount_stocks_df
+    )
+    return render_charts(chart_data, date, deadline=deadline)
+
+def create_hugo_post(market_summary, ai_analysis, save_dir='content/posts', date=None):
+    """
+    生成 Hugo 博客的 Markdown 内容，返回生成的文件路径
+    date 为数据日期 YYYYMMDD：文件名和发布时间都由它决定，重新渲染某一天时覆盖当天的文章而不是新建一篇
+    """
+    import pytz
+
     # 确保目录存在
     os.makedirs(save_dir, exist_ok=True)
     
@@ -555,13 +798,29 @@ def create_hugo_post(market_summary, ai_analysis, save_dir='content/posts'):
     swiss_tz = pytz.timezone('Europe/Zurich')
     # 2. 将时间往前拨 10 分钟，确保 100% 判定为“已发布”
     safe_now = datetime.now(swiss_tz) - timedelta(minutes=10)
+    if date is not None:
+        # 数据日期收盘后（北京时间 15:30），且不晚于当前时间，避免 Hugo 把文章当作未来文章跳过
+        close_time = pytz.timezone('Asia/Shanghai').localize(datetime.strptime(f"{date} 15:30", "%Y%m%d %H:%M"))
+        publish_time = min(safe_now, close_time.astimezone(swiss_tz))
+    else:
+        publish_time = safe_now
     
     # 生成文件名和 ISO 时间戳
-    date_filename = safe_now.strftime("%Y-%m-%d")
+    date_filename = publish_time.strftime("%Y-%m-%d") if date is None else f"{date[:4]}-{date[4:6]}-{date[6:]}"
     # 格式示例: 2026-02-12T20:15:00+01:00
-    formatted_date = safe_now.strftime("%Y-%m-%dT%H:%M:%S%z")
+    formatted_date = publish_time.strftime("%Y-%m-%dT%H:%M:%S%z")
     
     filename = f"{save_dir}/stock-analysis-{date_filename}.md"
+    # 重新渲染已发布的文章时沿用原来的发布时间
+    if os.path.exists(filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            existing = f.read()
+        for line in existing.splitlines()[1:]:
+            if line.startswith('date: '):
+                formatted_date = line[len('date: '):].strip()
+                break
+            if line.strip() == '---':
+                break
     display_title = f"A股全市场复盘：{date_filename} 深度解析及AI洞察"
 
     content = f"""---
@@ -594,6 +853,13 @@ draft: false
         f.write(content)
     print(f"成功生成报告: {filename}")
     print(f"文章发布时间设为: {formatted_date}")
+    return filename
+
+def to_markdown_or_note(df, name):
+    """DataFrame 转 Markdown 表格；上游阶段超时/失败导致输入缺失时返回降级提示，而不是报错"""
+    if df is None:
+        return f"> ⚠️ 数据暂缺：{name}未能按时获取，本节已降级。"
+    return df.to_markdown(index=False)
 
 def create_content(
         index_df, up_count, down_count,
@@ -603,86 +869,110 @@ def create_content(
         lhb_df,
         watchlist1_df, watchlist2_df,
         date="20260213",
-        save_dir='data'
+        save_dir='data',
+        daily_diff_df=None,
+        watchlist3_df=None,
+        degraded_stages=None,
+        charts=None
     ):
-    """生成市场汇总的 Markdown 内容"""
+    """生成市场汇总的 Markdown 内容；缺失的输入（为 None）对应的章节标记为降级"""
     
     file_path = f"{save_dir}/market_summary_{date}.md"
 
-    content = f"""---
-date: A股全市场复盘 {date} 
----
+    degraded_note = ""
+    if degraded_stages:
+        degraded_note = f"> ⚠️ 本期以下数据阶段超时或失败，相关章节已降级：{'、'.join(degraded_stages)}\n\n"
 
+    if index_df is not None and len(index_df) > 2:
+        index_lines = f"""- **上证指数**: {index_df.iloc[0]['最新价']:.2f} ({index_df.iloc[0]['涨跌幅']:.2f}%)
+- **全市场成交总额**: {index_df.iloc[2]['成交额(亿元)']}"""
+    else:
+        index_lines = "- **上证指数 / 全市场成交总额**: 数据暂缺"
+    breadth = f"{up_count} / {down_count}" if up_count is not None else "数据暂缺"
+    pool_counts = " / ".join('—' if df is None else str(len(df)) for df in (zt_pool_df, dt_pool_df, zb_pool_df))
 
-### 📊 市场核心快照
-- **上证指数**: {index_df.iloc[0]['最新价']:.2f} ({index_df.iloc[0]['涨跌幅']:.2f}%)
-- **全市场成交总额**: {index_df.iloc[2]['成交额(亿元)']}
-- **涨跌比**: {up_count} / {down_count}
-- **涨停/跌停/炸板数**: {len(zt_pool_df)} / {len(dt_pool_df)} / {len(zb_pool_df)}
+    concept_cons_sections = "".join(
+        f"""- 板块{i}. {df['所属板块'].iloc[0] if not df.empty else ''}
 
----
+{df.to_markdown(index=False)}
 
-### 🔍 成交额前二十个股
+""" for i, df in enumerate(concept_cons_topn or [], start=1))
+    charts = charts or {}
 
-{top_amount_stocks_df.to_markdown(index=False)}
+    if not concept_cons_sections:
+        concept_cons_sections = to_markdown_or_note(None, '概念板块成分股') + "\n\n"
 
----
+    watchlist3_section = ""
+    if watchlist3_df is not None and not watchlist3_df.empty:
+        watchlist3_section = f"""- **全市场评分池**（全市场多因子加权评分前 {len(watchlist3_df)}：成交额排名、量比、换手率、涨速、涨跌幅、60日涨跌幅、涨停、热门概念）
 
-### 🏆 行业板块分析
-- **前五概念板块**（按涨幅排序）
-
-{concept_summary_df.to_markdown(index=False)}
-
-- **各板块板块涨幅靠前个股**（按涨幅排序）
+{watchlist3_df.to_markdown(index=False)}
 
-- 板块1. {concept_cons_topn[0]['所属板块'].iloc[0]}
+"""
 
-{concept_cons_topn[0].to_markdown(index=False)}
+    content = f"""---
+date: A股全市场复盘 {date} 
+---
 
-- 板块2. {concept_cons_topn[1]['所属板块'].iloc[0]}
+{degraded_note}
+### 📊 市场核心快照
+{index_lines}
+- **涨跌比**: {breadth}
+- **涨停/跌停/炸板数**: {pool_counts}
 
-{concept_cons_topn[1].to_markdown(index=False)}
+{chart_markdown(charts, 'breadth', date)}---
 
-- 板块3. {concept_cons_topn[2]['所属板块'].iloc[0]}
+### 🔍 成交额前二十个股
 
-{concept_cons_topn[2].to_markdown(index=False)}
+{chart_markdown(charts, 'turnover', date)}{to_markdown_or_note(top_amount_stocks_df, '成交额榜')}
 
-- 板块4. {concept_cons_topn[3]['所属板块'].iloc[0]}
+---
 
-{concept_cons_topn[3].to_markdown(index=False)}
+### 🏆 行业板块分析
+- **前五概念板块**（按涨幅排序）
 
-- 板块5. {concept_cons_topn[4]['所属板块'].iloc[0]}
+{to_markdown_or_note(concept_summary_df, '概念板块行情')}
 
-{concept_cons_topn[4].to_markdown(index=False)}
+{chart_markdown(charts, 'concept', date)}
+- **各板块板块涨幅靠前个股**（按涨幅排序）
 
----
+{concept_cons_sections}---
 
 ### 💥 涨停/炸板个股
 
-- 涨停池
+{chart_markdown(charts, 'streak', date)}- 涨停池
 
-{zt_pool_df.to_markdown(index=False)}
+{to_markdown_or_note(zt_pool_df, '涨停池')}
 
 - 炸板池
 
-{zb_pool_df.to_markdown(index=False)}
+{to_markdown_or_note(zb_pool_df, '炸板池')}
 
 ---
 
 ### 🚀 龙虎榜
 
-{lhb_df.to_markdown(index=False)}
+{to_markdown_or_note(lhb_df, '龙虎榜')}
 
 ---
 
 ### ⭐ 重点个股 Watchlist
 - **大额异动池**（成交额前二十，且在涨/跌/炸/龙虎榜/前五板块成员中）
 
-{watchlist1_df.to_markdown(index=False)}
+{to_markdown_or_note(watchlist1_df, '大额异动池')}
 
 - **风口涨停池**（涨停/炸板，且在前五板块成员中）
 
-{watchlist2_df.to_markdown(index=False)}
+{to_markdown_or_note(watchlist2_df, '风口涨停池')}
+
+{watchlist3_section}---
+
+"""
+    if daily_diff_df is not None and not daily_diff_df.empty:
+        content += f"""### 🔄 昨日对比
+- **与上一交易日对比**（成交额榜新进/退出/留榜、重点池留存、连板晋级/断板；量能倍数 = 今日成交额 / 昨日成交额）
+
+{daily_diff_df.to_markdown(index=False)}
 
 ---
 
@@ -697,45 +987,117 @@ date: A股全市场复盘 {date}
 
     return content
 
-def fetch_and_save(date='20260213', save_dir='data'):
-    """主函数：获取数据并保存"""
+def fetch_and_save(date='20260213', save_dir='data', runner=None):
+    """
+    主函数：获取数据并保存
+    每个阶段都经过 runner 执行：超过时间预算或失败时用缓存/部分数据继续，依赖缺失的下游阶段直接跳过
+    """
+    runner = runner or StageRunner()
+    budgets = STAGE_BUDGETS
+
     # 获取大盘数据并保存
-    index_df = stock_summary(date=date, save_dir=save_dir)
+    index_df = runner.run('大盘指数', stock_summary, date=date, save_dir=save_dir, budget=budgets['大盘指数'])
 
     # 获取涨停数据并保存
-    zt_pool_df, dt_pool_df, zb_pool_df = stock_zt_dt_pool(date=date, save_dir=save_dir)
+    zt_pool_df, dt_pool_df, zb_pool_df = runner.run('涨跌停池', stock_zt_dt_pool, date=date, save_dir=save_dir,
+                                                    budget=budgets['涨跌停池'], fallback=(None, None, None))
     # TODO: 连板数据分析
 
     # 获取所有股票数据并保存
-    all_stocks_df, up_count, down_count, flat_count = fetch_all_stock_data(date=date, save_dir=save_dir, max_retries=3)
+    all_stocks_df, up_count, down_count, flat_count = runner.run('全市场快照', fetch_all_stock_data,
+                                                                  date=date, save_dir=save_dir, max_retries=3,
+                                                                  budget=budgets['全市场快照'],
+                                                                  fallback=(None, None, None, None))
 
     # 成交量前二十的个股名称、成交额、涨幅、以及所属板块或者概念
-    top_amount_stocks_df = get_top_amount_stocks(all_stocks_df, top_n=20, date=date, save_dir=save_dir)
+    top_amount_stocks_df = runner.run('成交额榜', get_top_amount_stocks, all_stocks_df, top_n=20, date=date,
+                                      save_dir=save_dir, budget=budgets['成交额榜'],
+                                      requires={'全市场快照': all_stocks_df})
 
     # 涨幅前五板块中涨停个股、连板高度（几天几板、首板后涨幅）
     # # 同花顺-同花顺行业一览表
     # industry_summary_df = get_industry_summary(date=latest_date, save_dir=save_dir)
     
     # 东方财富-概念板块 实时行情数据
-    concept_summary_df = get_concept_summary(date=date, save_dir=save_dir)
+    concept_summary_df = runner.run('概念板块', get_concept_summary, date=date, save_dir=save_dir,
+                                    budget=budgets['概念板块'])
 
     # 概念板块成分股数据
-    concept_cons, concept_cons_topn = get_concept_cons(concept_summary_df, date=date, save_dir=save_dir)
+    concept_cons, concept_cons_topn = runner.run('概念成分股', get_concept_cons, concept_summary_df, date=date,
+                                                 save_dir=save_dir, budget=budgets['概念成分股'], fallback=([], []),
+                                                 requires={'概念板块': concept_summary_df})
 
     # 龙虎榜
-    lhb_df = get_lhb_data(date=date, save_dir=save_dir)
+    lhb_df = runner.run('龙虎榜', get_lhb_data, date=date, save_dir=save_dir, budget=budgets['龙虎榜'])
+
+    # 个股 -> 概念板块 倒排索引（超时则沿用已有索引，后台线程写完的索引下次运行可用）
+    concept_index, concept_ranking = runner.run('概念倒排索引', get_concept_index, date=date,
+                                                budget=budgets['概念倒排索引'], deadline_arg='deadline',
+                                                fallback=lambda: (ConceptIndex.load(), load_meta().get('ranking', [])))
 
     # 重点个股信息
-    watchlist1_df, watchlist2_df = get_watchlist(
-                                                    top_amount_stocks_df,
-                                                    zt_pool_df,
-                                                    zb_pool_df,
-                                                    dt_pool_df,
-                                                    lhb_df,
-                                                    concept_cons,
-                                                    date=date,
-                                                    save_dir=save_dir
-                                                )
+    watchlist1_df, watchlist2_df = runner.run(
+                                                '重点个股',
+                                                get_watchlist,
+                                                top_amount_stocks_df,
+                                                zt_pool_df,
+                                                zb_pool_df,
+                                                dt_pool_df,
+                                                lhb_df if lhb_df is not None else pd.DataFrame(),  # 龙虎榜缺失不影响其余条件
+                                                concept_cons,
+                                                date=date,
+                                                save_dir=save_dir,
+                                                concept_index=concept_index,
+                                                concept_ranking=concept_ranking,
+                                                budget=budgets['重点个股'],
+                                                fallback=(None, None),
+                                                requires={'成交额榜': top_amount_stocks_df, '涨跌停池': zt_pool_df,
+                                                          '炸板池': zb_pool_df, '跌停池': dt_pool_df}
+                                            )
+
+    # 全市场多因子评分
+    watchlist3_df = runner.run(
+                                '全市场评分',
+                                get_score_watchlist,
+                                all_stocks_df,
+                                zt_pool_df,
+                                concept_cons,
+                                date=date,
+                                save_dir=save_dir,
+                                budget=budgets['全市场评分'],
+                                requires={'全市场快照': all_stocks_df}
+                            )
+
+    # 与上一交易日对比
+    daily_diff_df = runner.run(
+                                '昨日对比',
+                                get_daily_diff,
+                                all_stocks_df,
+                                top_amount_stocks_df,
+                                zt_pool_df,
+                                watchlist1_df,
+                                watchlist2_df,
+                                date=date,
+                                save_dir=save_dir,
+                                budget=budgets['昨日对比'],
+                                requires={'全市场快照': all_stocks_df}
+                            )
+
+    # 报告图表与公众号封面
+    charts = runner.run(
+                        '图表',
+                        get_report_charts,
+                        date,
+                        index_df,
+                        all_stocks_df,
+                        zt_pool_df,
+                        dt_pool_df,
+                        concept_summary_df,
+                        top_amount_stocks_df,
+                        budget=budgets['图表'],
+                        deadline_arg='deadline',
+                        fallback={}
+                    )
 
     # TODO: 热度榜
 
@@ -757,8 +1119,12 @@ def fetch_and_save(date='20260213', save_dir='data'):
         lhb_df=lhb_df,
         watchlist1_df=watchlist1_df,
         watchlist2_df=watchlist2_df,
-        date=latest_date,
-        save_dir=save_dir
+        date=date,
+        save_dir=save_dir,
+        daily_diff_df=daily_diff_df,
+        watchlist3_df=watchlist3_df,
+        degraded_stages=runner.degraded,
+        charts=charts
     )
 
     return market_summary
@@ -776,10 +1142,12 @@ def analyze_market_with_ai(market_summary, date='20260213', save_dir='data'):
         2. 💰 核心主线与资金流向
         - 分析【成交额前二十】和【行业涨幅榜】，识别出目前资金主要锁定的“热点板块”和“大容错板块”。
         - 判断市场风格：是偏向“题材炒作”还是“权重护盘”？
+        - 结合【昨日对比】中成交额榜的新进/退出个股及量能倍数，判断资金是在延续主线还是切换方向。
 
         3. 🪜 连板梯度与空间博弈
         - 识别【涨停池】中的最高板（空间板）及其带动的属性。
         - 重点解读【炸板池】中的个股信号：是高位减速、还是分歧后的良性分歧？
+        - 参考【昨日对比】中的连板晋级与断板个股，评估连板晋级率和接力情绪。
 
         4. ⚡ 重点异动个股分析
         - 请从【重点个股 Watchlist】中挑选 2-3 只最具代表性的个股（如大成交涨停、高低位切换的典型），推测其背后的逻辑（资产注入、政策利好、超跌反弹还是技术突破）。
@@ -800,7 +1168,9 @@ def analyze_market_with_ai(market_summary, date='20260213', save_dir='data'):
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     MODEL_NAME = 'gemini-2.5-flash'
 
-    client = genai.Client(api_key=GEMINI_API_KEY)
+    from google import genai # 仅在需要调用 AI 时导入，避免拖慢 --render-only 等本地命令的启动
+
+    client = genai.Client(api_key=GEMINI_API_KEY, http_options={'timeout': GEMINI_TIMEOUT * 1000})  # 单位为毫秒
     response = client.models.generate_content(
         model=MODEL_NAME,
         contents=prompt
@@ -819,12 +1189,14 @@ def analyze_market_with_ai(market_summary, date='20260213', save_dir='data'):
 
     return response.text
 
-def prepare_date_and_directory():
+def prepare_date_and_directory(runner=None):
     """准备最新日期和数据目录"""
-    latest_date = get_latest_date()
+    runner = runner or StageRunner()
+    latest_date = runner.run('最新交易日', get_latest_date, budget=STAGE_BUDGETS['最新交易日'])
     # latest_date = datetime.now().strftime("%Y%m%d")
     if latest_date is None:
         print("❌ 无法确定最新数据日期，脚本终止。")
+        runner.summary()
         exit(1)
     os.makedirs("data", exist_ok=True)
     save_dir = f"data/{latest_date}"
@@ -832,11 +1204,100 @@ def prepare_date_and_directory():
 
     return latest_date, save_dir
 
+def render_from_cache(date, save_dir, posts_dir='content/posts', html_path='content/html/ready_to_post.html'):
+    """
+    仅根据本地缓存的 data/<date> 文件重新生成 market_summary、Hugo 博客和微信公众号 HTML
+    不导入任何网络客户端（akshare / google-genai / requests），用于调整模板后快速重新发布
+    """
+    from md_to_wechat import convert_md_to_wechat_html
+
+    def load(name):
+        return load_local_csv(f"{save_dir}/{name}_{date}.csv")
+
+    all_stocks_df = load('A_stock')
+    up_count, down_count, _ = count_breadth(all_stocks_df) if all_stocks_df is not None else (None, None, None)
+    concept_cons_topn = []
+    for i in range(5):
+        concept_cons_df = load(f'concept_cons_{i}')
+        if concept_cons_df is None:
+            break
+        concept_cons_topn.append(concept_cons_df)
+
+    try:
+        charts = get_report_charts(date, load('index'), all_stocks_df, load('zt_pool'), load('dt_pool'),
+                                   load('concept_summary'), load('top_amount_stocks'))
+    except Exception as e:
+        print(f"⚠️ 绘制图表失败，报告中将不包含图表: {e}")
+        charts = {}
+
+    market_summary = create_content(
+        index_df=load('index'),
+        zt_pool_df=load('zt_pool'),
+        dt_pool_df=load('dt_pool'),
+        zb_pool_df=load('zb_pool'),
+        up_count=up_count,
+        down_count=down_count,
+        top_amount_stocks_df=load('top_amount_stocks'),
+        concept_summary_df=load('concept_summary'),
+        concept_cons_topn=concept_cons_topn,
+        lhb_df=load('lhb'),
+        watchlist1_df=load('watchlist1'),
+        watchlist2_df=load('watchlist2'),
+        date=date,
+        save_dir=save_dir,
+        daily_diff_df=load('daily_diff'),
+        watchlist3_df=load('watchlist3'),
+        charts=charts
+    )
+
+    ai_analysis = load_local_text(f"{save_dir}/ai_analysis_{date}.md")
+    if ai_analysis is None:
+        print(f"⚠️ 未找到 {date} 的 AI 分析结果，博客中将不包含 AI 分析")
+        ai_analysis = "*本期 AI 分析暂缺。*"
+    post_path = create_hugo_post(market_summary, ai_analysis, save_dir=posts_dir, date=date)
+
+    with open(post_path, 'r', encoding='utf-8') as f:
+        wechat_html = convert_md_to_wechat_html(f.read())
+    os.makedirs(os.path.dirname(html_path), exist_ok=True)
+    with open(html_path, 'w', encoding='utf-8') as f:
+        f.write(wechat_html)
+    print(f"微信公众号 HTML 已保存至: {html_path}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="A股每日复盘：抓取数据、AI 分析并生成 Hugo 博客")
+    parser.add_argument('--render-only', action='store_true',
+                        help='不联网，只根据本地缓存的 data/<date> 重新生成汇总、博客和微信 HTML')
+    parser.add_argument('--date', help='数据日期 YYYYMMDD，--render-only 时默认为本地最新日期')
+    parser.add_argument('--budget', type=float, default=PIPELINE_BUDGET,
+                        help='数据抓取阶段的总时间预算（秒），超出后剩余的抓取阶段跳过，直接用已有数据生成博客')
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    latest_date, save_dir = prepare_date_and_directory()
-    market_summary = fetch_and_save(date=latest_date, save_dir=save_dir)
+    args = parse_args()
+    if args.render_only:
+        available_dates = list_available_dates('data')
+        render_date = args.date or (available_dates[-1] if available_dates else None)
+        if render_date is None:
+            print("❌ 本地没有任何缓存数据，无法渲染。")
+            exit(1)
+        render_from_cache(date=render_date, save_dir=f"data/{render_date}")
+        exit(0)
+
+    runner = StageRunner(total_budget=args.budget)
+    latest_date, save_dir = prepare_date_and_directory(runner=runner)
+    market_summary = fetch_and_save(date=latest_date, save_dir=save_dir, runner=runner)
     print("市场数据汇总已生成，正在进行AI分析...")
-    ai_analysis = analyze_market_with_ai(market_summary, date=latest_date, save_dir=save_dir)
+    # 发布阶段不受总预算限制：即使抓取阶段用完了预算，AI 分析也按自身预算尝试一次，失败则发布不含 AI 分析的博客
+    ai_analysis = runner.run('AI 分析', analyze_market_with_ai, market_summary, date=latest_date, save_dir=save_dir,
+                             budget=STAGE_BUDGETS['AI 分析'], ignore_deadline=True,
+                             fallback="*本期 AI 分析暂缺（请求超时或失败）。*")
     print("AI分析完成，正在生成Hugo博客内容...")
-    create_hugo_post(market_summary, ai_analysis, save_dir='content/posts')
-                                                                                                                    
\ No newline at end of file
+    runner.run('Hugo 博客', create_hugo_post, market_summary, ai_analysis, save_dir='content/posts', date=latest_date,
+               budget=STAGE_BUDGETS['Hugo 博客'], ignore_deadline=True)
+    from stock_pages import generate_stock_pages
+    runner.run('个股档案', generate_stock_pages, date=latest_date, budget=STAGE_BUDGETS['个股档案'],
+               ignore_deadline=True)
+    from search_index import refresh_search_index
+    runner.run('搜索索引', refresh_search_index, latest_date, budget=STAGE_BUDGETS['搜索索引'],
+               ignore_deadline=True)
+    runner.summary()
@@ -0,0 +1,248 @@
+import argparse
+import heapq
+import math
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from data_archive import list_available_dates, load_local_csv, write_json
+from snapshot_sources import fetch_snapshot_hedged
+
+
+def limit_ratio(code, name):
+    """按板块/ST 返回涨跌停幅度：科创板、创业板 20%，北交所 30%（ST 股同样适用），仅主板 ST 为 5%"""
+    if code.startswith(('688', '689', '300', '301')):
+        return 0.20
+    if code.startswith(('4', '8', '92')):
+        return 0.30
+    if isinstance(name, str) and 'ST' in name.upper():
+        return 0.05
+    return 0.10
+
+def limit_prices(prev_close, ratio):
+    """涨停价 / 跌停价（四舍五入到分）"""
+    return round(prev_close * (1 + ratio) + 1e-9, 2), round(prev_close * (1 - ratio) + 1e-9, 2)
+
+
+class LazyTopN:
+    """
+    带惰性删除的最大堆：更新某个 key 时只压入新条目 O(log n)，旧条目在读取前 N 时被跳过丢弃，
+    过期条目过多时整体重建，堆的大小始终与存活 key 数同阶
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._values = {}
+
+    def update(self, key, value):
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            self.remove(key)
+            return
+        if self._values.get(key) == value:
+            return
+        self._values[key] = value
+        heapq.heappush(self._heap, (-value, key))
+        if len(self._heap) > 4 * len(self._values) + 64:
+            self._heap = [(-v, k) for k, v in self._values.items()]
+            heapq.heapify(self._heap)
+
+    def remove(self, key):
+        self._values.pop(key, None)
+
+    def top(self, n):
+        """返回 [(key, value), ...]，按 value 降序，代价 O(n log h + 过期条目数)"""
+        result, popped, seen = [], [], set()
+        while self._heap and len(result) < n:
+            item = heapq.heappop(self._heap)
+            neg_value, key = item
+            if key in seen or self._values.get(key) != -neg_value:
+                continue  # 过期条目直接丢弃
+            seen.add(key)
+            result.append((key, -neg_value))
+            popped.append(item)
+        for item in popped:
+            heapq.heappush(self._heap, item)
+        return result
+
+    def __len__(self):
+        return len(self._values)
+
+
+class IntradayAggregates:
+    """
+    盘中增量聚合：每个 tick 只处理相对上一次快照发生变化的行
+    - 涨跌家数
+    - 成交额前 N（LazyTopN 堆）
+    - 涨停 / 跌停集合
+    - 概念板块领涨股（每个板块一个 LazyTopN 堆）
+    变化检测是一次向量化比较，之后所有聚合的更新代价都是 O(变化行数)
+    """
+
+    TRACKED_COLUMNS = ['名称', '最新价', '涨跌幅', '成交额', '昨收']
+
+    def __init__(self, concept_members=None, top_n=20):
+        self.top_n = top_n
+        self.breadth = {'上涨': 0, '下跌': 0, '平盘': 0}
+        self.turnover = LazyTopN()
+        self.limit_up = set()
+        self.limit_down = set()
+        self.names = {}
+        self.concepts_of = {}                   # 代码 -> [概念]
+        for concept, codes in (concept_members or {}).items():
+            for code in codes:
+                self.concepts_of.setdefault(code, []).append(concept)
+        self.concept_leaders = {concept: LazyTopN() for concept in (concept_members or {})}
+        self._last = None                       # 上一次快照（按代码索引），用于向量化变化检测
+        self._rows = {}                         # 代码 -> 上一次计入聚合的行
+        self.tick = 0
+        self.changed = 0
+
+    @staticmethod
+    def _direction(pct):
+        if pd.isna(pct):
+            return None
+        return '上涨' if pct > 0 else ('下跌' if pct < 0 else '平盘')
+
+    def _retract(self, code, row):
+        """撤销某只股票旧值对各聚合的贡献"""
+        direction = self._direction(row['涨跌幅'])
+        if direction is not None:
+            self.breadth[direction] -= 1
+        self.limit_up.discard(code)
+        self.limit_down.discard(code)
+        self.turnover.remove(code)
+        for concept in self.concepts_of.get(code, ()):
+            self.concept_leaders[concept].remove(code)
+
+    def _apply(self, code, row):
+        """把某只股票的新值计入各聚合"""
+        self.names[code] = row['名称']
+        direction = self._direction(row['涨跌幅'])
+        if direction is not None:
+            self.breadth[direction] += 1
+        price, prev_close = row['最新价'], row['昨收']
+        if pd.notna(price) and pd.notna(prev_close) and prev_close > 0:
+            up_price, down_price = limit_prices(prev_close, limit_ratio(code, row['名称']))
+            if price >= up_price:
+                self.limit_up.add(code)
+            elif price <= down_price:
+                self.limit_down.add(code)
+        self.turnover.update(code, float(row['成交额']))
+        for concept in self.concepts_of.get(code, ()):
+            self.concept_leaders[concept].update(code, float(row['涨跌幅']))
+
+    def update(self, snapshot_df):
+        """用一次新的全市场快照增量更新聚合，返回变化的行数"""
+        current = snapshot_df[['代码'] + self.TRACKED_COLUMNS].copy()
+        current['代码'] = current['代码'].astype(str).str[-6:]
+        current = current.drop_duplicates('代码').set_index('代码')
+
+        if self._last is None:
+            changed_codes = current.index
+            removed_codes = []
+        else:
+            previous = self._last.reindex(current.index)
+            values_now = current[['最新价', '涨跌幅', '成交额']]
+            values_before = previous[['最新价', '涨跌幅', '成交额']]
+            differs = (values_now != values_before) & ~(values_now.isna() & values_before.isna())
+            changed_codes = current.index[differs.any(axis=1).to_numpy()]
+            removed_codes = self._last.index.difference(current.index)
+
+        for code in removed_codes:
+            self._retract(code, self._rows.pop(code))
+        changed_rows = current.loc[changed_codes]
+        for code, row in zip(changed_rows.index, changed_rows.to_dict('records')):
+            if code in self._rows:
+                self._retract(code, self._rows[code])
+            self._apply(code, row)
+            self._rows[code] = row
+
+        self._last = current
+        self.tick += 1
+        self.changed = len(changed_codes) + len(removed_codes)
+        return self.changed
+
+    def status(self, leaders_per_concept=1):
+        """生成紧凑的状态字典，用于写入状态文件"""
+        return {
+            'tick': self.tick,
+            'changed': self.changed,
+            'breadth': self.breadth,
+            'turnover_top': [[code, self.names.get(code), round(amount / 1e8, 2)]
+                             for code, amount in self.turnover.top(self.top_n)],
+            'limit_up': sorted(self.limit_up),
+            'limit_down': sorted(self.limit_down),
+            'concept_leaders': {
+                concept: [[code, self.names.get(code), round(pct, 2)] for code, pct in heap.top(leaders_per_concept)]
+                for concept, heap in self.concept_leaders.items()
+            },
+        }
+
+
+def load_concept_members(data_root='data', top_n=5):
+    """从最近一个交易日缓存的概念板块成分股文件中读取 概念 -> 代码列表"""
+    dates = list_available_dates(data_root)
+    if not dates:
+        return {}
+    date = dates[-1]
+    members = {}
+    for i in range(top_n):
+        df = load_local_csv(f"{data_root}/{date}/concept_cons_{i}_{date}.csv")
+        if df is None or df.empty:
+            continue
+        members[df['所属板块'].iloc[0]] = df['代码'].astype(str).str.zfill(6).tolist()
+    return members
+
+def run_intraday(interval=60, top_n=20, data_root='data', out_dir='data/live', max_ticks=None, until='15:05',
+                 hedge_after=3.0):
+    """盘中轮询模式：按固定间隔抓取全市场快照，增量更新聚合并在每个 tick 后输出状态文件"""
+    import pytz
+
+    tz = pytz.timezone('Asia/Shanghai')
+    os.makedirs(out_dir, exist_ok=True)
+    aggregates = IntradayAggregates(concept_members=load_concept_members(data_root), top_n=top_n)
+
+    while max_ticks is None or aggregates.tick < max_ticks:
+        now = datetime.now(tz)
+        if now.strftime('%H:%M') > until:
+            print(f"⏹️ 已到收盘时间 {until}，停止轮询")
+            break
+        started = time.perf_counter()
+        try:
+            # 轮询间隔短于快照缓存的有效期，每个 tick 都必须绕过缓存取最新快照
+            snapshot_df = fetch_snapshot_hedged(primary='em', secondary='sina', hedge_after=hedge_after,
+                                                use_cache=False)
+        except Exception as e:
+            print(f"⚠️ 盘中快照抓取失败: {e}")
+            time.sleep(interval)
+            continue
+        fetched = time.perf_counter()
+        changed = aggregates.update(snapshot_df)
+        updated = time.perf_counter()
+
+        status = aggregates.status()
+        status['time'] = now.strftime('%Y-%m-%d %H:%M:%S')
+        status['fetch_ms'] = round((fetched - started) * 1000)
+        status['update_ms'] = round((updated - fetched) * 1000, 1)
+        # 原子写入，读取方不会读到写了一半的内容
+        write_json(status, f"{out_dir}/status_{now.strftime('%Y%m%d')}.json")
+        print(f"📡 {status['time']} 第 {aggregates.tick} 次更新: 变化 {changed} 行，"
+              f"上涨 {status['breadth']['上涨']} / 下跌 {status['breadth']['下跌']}，"
+              f"涨停 {len(status['limit_up'])} / 跌停 {len(status['limit_down'])}，"
+              f"聚合耗时 {status['update_ms']} ms")
+
+        time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="盘中轮询模式：增量更新市场聚合并输出状态文件")
+    parser.add_argument('--interval', type=float, default=60, help='轮询间隔（秒）')
+    parser.add_argument('--top-n', type=int, default=20, help='成交额榜保留的个股数')
+    parser.add_argument('--out-dir', default='data/live')
+    parser.add_argument('--max-ticks', type=int, default=None)
+    parser.add_argument('--until', default='15:05', help='北京时间，超过后停止轮询')
+    parser.add_argument('--hedge-after', type=float, default=3.0, help='主数据源超过该秒数未返回时对冲请求备用数据源')
+    args = parser.parse_args()
+    run_intraday(interval=args.interval, top_n=args.top_n, out_dir=args.out_dir,
+                 max_ticks=args.max_ticks, until=args.until, hedge_after=args.hedge_after)
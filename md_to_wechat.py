@@ -1,14 +1,22 @@
 import markdown
 import re
-import requests
 import json
 import os
+import glob
+import argparse
+
+
+# 微信接口请求超时（秒）：(连接超时, 读取超时)，避免接口无响应时任务一直挂起
+REQUEST_TIMEOUT = (10, 60)
+STATIC_DIR = 'static'           # 文章中的图表以 ../../charts/<date>/x.png 引用，对应 static/charts/<date>/x.png
+DEFAULT_COVER = 'content/images/demo.jpg'
 
 
 def convert_md_to_wechat_html(md_content):
     # --- 修复 1: 剔除 Markdown 元数据 (Frontmatter) ---
-    # 匹配开头两个 --- 之间的所有内容并删除
-    md_content = re.sub(r'^---.*?---', '', md_content, flags=re.DOTALL | re.MULTILINE)
+    # 只删除文件开头的 Frontmatter，以及嵌入的市场汇总自带的 date 头；正文中作为分隔线的 --- 之间的内容必须保留
+    md_content = re.sub(r'\A---\n.*?\n---\n', '', md_content, flags=re.DOTALL)
+    md_content = re.sub(r'^---\ndate:[^\n]*\n---$', '', md_content, flags=re.MULTILINE)
 
     # 1. 定义更严谨的内联样式
     styles = {
@@ -20,7 +28,8 @@ def convert_md_to_wechat_html(md_content):
         'strong': 'color: #d63031; font-weight: bold;',
         'blockquote': 'margin: 15px 0; padding: 15px; border-left: 4px solid #07C160; background: #f8f8f8; color: #666;',
         'ul': 'margin: 10px 0; padding-left: 20px; list-style-type: disc;', # 修复列表显示
-        'li': 'margin: 8px 0; line-height: 1.6; color: #3f3f3f; font-size: 15px;' # 修复列表间距
+        'li': 'margin: 8px 0; line-height: 1.6; color: #3f3f3f; font-size: 15px;', # 修复列表间距
+        'img': 'max-width: 100%; height: auto; display: block; margin: 15px auto;'
     }
 
     # 2. 转换 Markdown
@@ -50,10 +59,12 @@ def convert_md_to_wechat_html(md_content):
     return final_html
 
 def get_access_token():
+    import requests # 仅上传时需要，避免 HTML 渲染时导入网络客户端
+
     appid = os.getenv("WECHAT_APPID")
     secret = os.getenv("WECHAT_SECRET")
     url = f"https://api.weixin.qq.com/cgi-bin/token?grant_type=client_credential&appid={appid}&secret={secret}"
-    res = requests.get(url).json()
+    res = requests.get(url, timeout=REQUEST_TIMEOUT).json()
     token = res.get("access_token")
     if not token:
         print(f"❌ 获取 Token 失败: {res}")
@@ -61,6 +72,8 @@ def get_access_token():
 
 def upload_image_as_thumb(access_token, image_path):
     """上传封面图并返回 media_id"""
+    import requests
+
     if not os.path.exists(image_path):
         print(f"❌ 找不到封面图片: {image_path}")
         return None
@@ -71,7 +84,7 @@ def upload_image_as_thumb(access_token, image_path):
     with open(image_path, 'rb') as f:
         files = {'media': f}
         # 注意：这里是 multipart/form-data
-        res = requests.post(url, files=files).json()
+        res = requests.post(url, files=files, timeout=REQUEST_TIMEOUT).json()
         
     media_id = res.get("media_id")
     if media_id:
@@ -80,7 +93,54 @@ def upload_image_as_thumb(access_token, image_path):
         print(f"❌ 封面图上传失败: {res}")
     return media_id
 
+def local_image_path(src):
+    """文章中图表的相对路径 -> 本地文件路径，非本地图表返回 None"""
+    if src.startswith(('http://', 'https://')) or 'charts/' not in src:
+        return None
+    path = os.path.join(STATIC_DIR, 'charts', src.split('charts/', 1)[1])
+    return path if os.path.exists(path) else None
+
+def upload_content_image(access_token, image_path):
+    """上传正文图片（不占用素材库），返回微信图片 URL"""
+    import requests
+
+    url = f"https://api.weixin.qq.com/cgi-bin/media/uploadimg?access_token={access_token}"
+    with open(image_path, 'rb') as f:
+        res = requests.post(url, files={'media': f}, timeout=REQUEST_TIMEOUT).json()
+    if not res.get("url"):
+        print(f"❌ 正文图片上传失败 {image_path}: {res}")
+    return res.get("url")
+
+def replace_content_images(access_token, content_html):
+    """微信正文只能引用微信域名下的图片：上传本地图表并替换 src，上传失败的图片从正文中移除"""
+    uploaded = {}
+
+    def replace(match):
+        src = match.group(2)
+        image_path = local_image_path(src)
+        if image_path is None:
+            return match.group(0)
+        if image_path not in uploaded:
+            uploaded[image_path] = upload_content_image(access_token, image_path)
+        url = uploaded[image_path]
+        return f'{match.group(1)}{url}{match.group(3)}' if url else ''
+
+    content_html = re.sub(r'(<img[^>]*?src=")([^"]+)("[^>]*>)', replace, content_html)
+    print(f"✅ 正文图片上传 {sum(1 for u in uploaded.values() if u)}/{len(uploaded)} 张")
+    return content_html
+
+def find_cover(md_content):
+    """当日封面：文章引用的图表目录下的 cover.png，没有时使用默认封面"""
+    match = re.search(r'charts/(\d{8})/', md_content)
+    if match:
+        cover_path = os.path.join(STATIC_DIR, 'charts', match.group(1), 'cover.png')
+        if os.path.exists(cover_path):
+            return cover_path
+    return DEFAULT_COVER
+
 def upload_to_wechat_draft(title, content_html, thumb_media_id):
+    import requests
+
     access_token = get_access_token()
     if not access_token or not thumb_media_id:
         return
@@ -103,7 +163,8 @@ def upload_to_wechat_draft(title, content_html, thumb_media_id):
 
     response = requests.post(
         draft_url, 
-        data=json.dumps(data, ensure_ascii=False).encode('utf-8')
+        data=json.dumps(data, ensure_ascii=False).encode('utf-8'),
+        timeout=REQUEST_TIMEOUT
     )
     
     result = response.json()
@@ -113,12 +174,18 @@ def upload_to_wechat_draft(title, content_html, thumb_media_id):
         print(f"❌ 上传失败: {result}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将 Hugo 文章转换为微信公众号 HTML 并上传草稿")
+    parser.add_argument('--post', help='文章路径，默认为 content/posts 下最新的一篇')
+    parser.add_argument('--cover', help='封面图片路径，默认为文章当日生成的 cover.png')
+    args = parser.parse_args()
+
     # 路径配置
-    md_path = 'content/posts/stock-analysis-2026-02-17.md'
-    img_path = 'content/images/demo.jpg' # 图片路径
+    md_path = args.post or sorted(glob.glob('content/posts/stock-analysis-*.md'))[-1]
+    post_date = os.path.basename(md_path)[len('stock-analysis-'):-len('.md')]
     
     with open(md_path, 'r', encoding='utf-8') as f:
         content = f.read()
+    img_path = args.cover or find_cover(content) # 图片路径
     
     # 转换 HTML
     wechat_ready_html = convert_md_to_wechat_html(content)
@@ -128,6 +195,8 @@ if __name__ == "__main__":
     if token:
         # 1. 先传图片拿 ID
         thumb_id = upload_image_as_thumb(token, img_path)
-        # 2. 再传草稿
+        # 2. 正文中的图表上传到微信并替换地址
+        wechat_ready_html = replace_content_images(token, wechat_ready_html)
+        # 3. 再传草稿
         if thumb_id:
-            upload_to_wechat_draft("2026-02-17 A股复盘报告", wechat_ready_html, thumb_id)
\ No newline at end of file
+            upload_to_wechat_draft(f"{post_date} A股复盘报告", wechat_ready_html, thumb_id)
\ No newline at end of file
@@ -0,0 +1,272 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, as_completed
+
+import numpy as np
+import pandas as pd
+
+from data_archive import read_json, write_json
+
+
+CHART_DIR = 'static/charts'     # Hugo 原样发布到站点根目录的 charts/
+CHART_VERSION = 1               # 修改绘图样式后加一，使所有缓存的图表失效
+UP_COLOR = '#e84118'            # A 股习惯：红涨绿跌
+DOWN_COLOR = '#44bd32'
+FLAT_COLOR = '#7f8c8d'
+CJK_FONTS = ['Noto Sans CJK SC', 'Noto Sans CJK JP', 'WenQuanYi Zen Hei', 'SimHei', 'Microsoft YaHei',
+             'PingFang SC', 'DejaVu Sans']
+
+# 图表在报告中的标题
+CHART_TITLES = {
+    'breadth': '涨跌分布',
+    'streak': '连板梯队',
+    'concept': '概念板块热度',
+    'turnover': '成交额前二十',
+    'cover': '封面',
+}
+
+BREADTH_EDGES = [-100, -9, -7, -5, -3, -1, 0, 1, 3, 5, 7, 9, 100]
+BREADTH_LABELS = ['<-9', '-9~-7', '-7~-5', '-5~-3', '-3~-1', '-1~0', '0~1', '1~3', '3~5', '5~7', '7~9', '>9']
+
+
+def _to_yi(value):
+    """'138.16 亿' / '5000.00 万' / 数值（元） -> 亿元"""
+    if pd.isna(value):
+        return 0.0
+    if isinstance(value, str):
+        text = value.strip()
+        if text.endswith('亿'):
+            return float(text[:-1])
+        if text.endswith('万'):
+            return float(text[:-1]) / 1e4
+        return float(text) / 1e8
+    return float(value) / 1e8
+
+def build_chart_data(date, index_df=None, all_stocks_df=None, zt_pool_df=None, dt_pool_df=None,
+                     concept_summary_df=None, top_amount_stocks_df=None):
+    """把当日数据整理为各图表的绘图数据（只含基本类型，既可传给子进程，也用于计算缓存哈希）"""
+    charts = {}
+
+    if all_stocks_df is not None and not all_stocks_df.empty:
+        pct = pd.to_numeric(all_stocks_df['涨跌幅'], errors='coerce').dropna().to_numpy()
+        counts, _ = np.histogram(pct[pct != 0], bins=BREADTH_EDGES)
+        charts['breadth'] = {
+            'labels': BREADTH_LABELS,
+            'counts': counts.tolist(),
+            'up': int((pct > 0).sum()),
+            'down': int((pct < 0).sum()),
+            'flat': int((pct == 0).sum()),
+            'limit_up': 0 if zt_pool_df is None else len(zt_pool_df),
+            'limit_down': 0 if dt_pool_df is None else len(dt_pool_df),
+        }
+
+    if zt_pool_df is not None and not zt_pool_df.empty and '连板数' in zt_pool_df.columns:
+        ladder = {}
+        for name, streak in zip(zt_pool_df['名称'], pd.to_numeric(zt_pool_df['连板数'], errors='coerce').fillna(1)):
+            ladder.setdefault(int(streak), []).append(str(name))
+        charts['streak'] = {'levels': [[level, ladder[level]] for level in sorted(ladder, reverse=True)]}
+
+    if concept_summary_df is not None and not concept_summary_df.empty:
+        charts['concept'] = {'boards': [
+            [str(row['板块名称']), float(row['涨跌幅']), int(row.get('上涨家数') or 0), int(row.get('下跌家数') or 0)]
+            for row in concept_summary_df.to_dict('records')
+        ]}
+
+    if top_amount_stocks_df is not None and not top_amount_stocks_df.empty:
+        amount_col = '成交额(亿元)' if '成交额(亿元)' in top_amount_stocks_df.columns else '成交额'
+        charts['turnover'] = {'stocks': [
+            [str(row['名称']), round(_to_yi(row[amount_col]), 2), float(row['涨跌幅'])]
+            for row in top_amount_stocks_df.to_dict('records')
+        ]}
+
+    cover = {'date': date}
+    if index_df is not None and not index_df.empty:
+        cover['index'] = [str(index_df.iloc[0]['名称']), float(index_df.iloc[0]['最新价']), float(index_df.iloc[0]['涨跌幅'])]
+        if len(index_df) > 2 and '成交额(亿元)' in index_df.columns:
+            cover['amount'] = str(index_df.iloc[2]['成交额(亿元)'])
+    if 'breadth' in charts:
+        cover.update({k: charts['breadth'][k] for k in ('up', 'down', 'limit_up', 'limit_down')})
+    charts['cover'] = cover
+    return charts
+
+def chart_hash(name, data):
+    payload = json.dumps([CHART_VERSION, name, data], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def _draw_breadth(plt, data):
+    fig, ax = plt.subplots(figsize=(9, 4.2))
+    colors = [DOWN_COLOR] * 6 + [UP_COLOR] * 6
+    bars = ax.bar(data['labels'], data['counts'], color=colors)
+    ax.bar_label(bars, fontsize=9)
+    ax.set_title(f"涨跌分布  上涨 {data['up']} / 下跌 {data['down']} / 平盘 {data['flat']}  "
+                 f"涨停 {data['limit_up']} / 跌停 {data['limit_down']}")
+    ax.set_xlabel('涨跌幅 (%)')
+    ax.set_ylabel('个股数')
+    ax.spines[['top', 'right']].set_visible(False)
+    return fig
+
+def _draw_streak(plt, data):
+    levels = data['levels']
+    fig, ax = plt.subplots(figsize=(9, 0.6 * len(levels) + 1.5))
+    labels = [f"{level} 板" for level, _ in levels]
+    counts = [len(names) for _, names in levels]
+    bars = ax.barh(labels, counts, color=UP_COLOR)
+    for bar, (_, names) in zip(bars, levels):
+        text = '、'.join(names[:6]) + (f" 等{len(names)}只" if len(names) > 6 else '')
+        ax.text(bar.get_width() + 0.2, bar.get_y() + bar.get_height() / 2, text, va='center', fontsize=9)
+    ax.invert_yaxis()
+    ax.set_xlim(0, max(counts) * 2.2 + 1)
+    ax.set_title('连板梯队')
+    ax.set_xlabel('涨停家数')
+    ax.spines[['top', 'right']].set_visible(False)
+    return fig
+
+def _draw_concept(plt, data):
+    boards = data['boards']
+    fig, ax = plt.subplots(figsize=(9, 0.55 * len(boards) + 1.5))
+    names = [b[0] for b in boards]
+    pct = [b[1] for b in boards]
+    bars = ax.barh(names, pct, color=[UP_COLOR if p >= 0 else DOWN_COLOR for p in pct])
+    ax.bar_label(bars, labels=[f"{p:.2f}%  涨{u}/跌{d}" for _, p, u, d in boards], fontsize=9, padding=3)
+    ax.invert_yaxis()
+    ax.set_xlim(min(0, min(pct)) * 1.6, max(0, max(pct)) * 1.6 + 0.5)
+    ax.set_title('概念板块热度（涨跌幅，上涨/下跌家数）')
+    ax.spines[['top', 'right']].set_visible(False)
+    return fig
+
+def _draw_turnover(plt, data):
+    stocks = data['stocks']
+    fig, ax = plt.subplots(figsize=(9, 0.35 * len(stocks) + 1.5))
+    names = [s[0] for s in stocks]
+    amounts = [s[1] for s in stocks]
+    bars = ax.barh(names, amounts, color=[UP_COLOR if s[2] > 0 else (DOWN_COLOR if s[2] < 0 else FLAT_COLOR)
+                                          for s in stocks])
+    ax.bar_label(bars, labels=[f"{a:.1f}亿  {p:+.2f}%" for _, a, p in stocks], fontsize=8, padding=3)
+    ax.invert_yaxis()
+    ax.set_xlim(0, max(amounts) * 1.3)
+    ax.set_title('成交额前二十（亿元，颜色为涨跌）')
+    ax.spines[['top', 'right']].set_visible(False)
+    return fig
+
+def _draw_cover(plt, data):
+    """微信公众号封面，比例 2.35:1"""
+    fig = plt.figure(figsize=(9.4, 4.0))
+    fig.patch.set_facecolor('#1e272e')
+    date = data['date']
+    fig.text(0.05, 0.78, 'A股全市场复盘', color='white', fontsize=30, weight='bold')
+    fig.text(0.05, 0.62, f"{date[:4]}-{date[4:6]}-{date[6:]}", color='#d2dae2', fontsize=18)
+    if 'index' in data:
+        name, close, pct = data['index']
+        fig.text(0.05, 0.40, f"{name} {close:.2f}", color='white', fontsize=20)
+        fig.text(0.05, 0.28, f"{pct:+.2f}%", color=UP_COLOR if pct >= 0 else DOWN_COLOR, fontsize=22, weight='bold')
+    if 'amount' in data:
+        fig.text(0.05, 0.12, f"成交额 {data['amount']}", color='#d2dae2', fontsize=14)
+    if 'up' in data:
+        ax = fig.add_axes([0.58, 0.18, 0.37, 0.6])
+        labels = ['上涨', '下跌', '涨停', '跌停']
+        values = [data['up'], data['down'], data['limit_up'], data['limit_down']]
+        bars = ax.bar(labels, values, color=[UP_COLOR, DOWN_COLOR, UP_COLOR, DOWN_COLOR])
+        ax.bar_label(bars, color='white', fontsize=12)
+        ax.set_facecolor('#1e272e')
+        ax.tick_params(colors='white', labelsize=12)
+        ax.set_yticks([])
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+    return fig
+
+RENDERERS = {
+    'breadth': _draw_breadth,
+    'streak': _draw_streak,
+    'concept': _draw_concept,
+    'turnover': _draw_turnover,
+    'cover': _draw_cover,
+}
+
+def _render_chart(name, data, file_path):
+    """子进程中绘制单张图表：无界面后端，先写临时文件再原子替换"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    plt.rcParams['font.sans-serif'] = CJK_FONTS
+    plt.rcParams['axes.unicode_minus'] = False
+    fig = RENDERERS[name](plt, data)
+    tmp_path = f"{file_path}.tmp.png"
+    fig.savefig(tmp_path, dpi=110, bbox_inches='tight', facecolor=fig.get_facecolor())
+    plt.close(fig)
+    os.replace(tmp_path, file_path)
+    return name
+
+def render_charts(chart_data, date, out_dir=CHART_DIR, max_workers=None, deadline=None):
+    """
+    并行渲染当日图表，返回 {图表名: 文件路径}
+    每张图表以其绘图数据的哈希缓存（记录在 <out_dir>/<date>/charts.json），数据不变且文件存在时不重画
+    deadline: time.monotonic() 截止时刻，到期后取消尚未开始的绘制，只返回已画好的图表
+    """
+    chart_dir = f"{out_dir}/{date}"
+    os.makedirs(chart_dir, exist_ok=True)
+    manifest_path = f"{chart_dir}/charts.json"
+    manifest = read_json(manifest_path, {})
+
+    paths, jobs = {}, []
+    for name, data in chart_data.items():
+        file_path = f"{chart_dir}/{name}.png"
+        paths[name] = file_path
+        digest = chart_hash(name, data)
+        if manifest.get(name) != digest or not os.path.exists(file_path):
+            jobs.append((name, data, file_path, digest))
+
+    if jobs:
+        workers = min(len(jobs), max_workers or os.cpu_count() or 1)
+        executor = ProcessPoolExecutor(max_workers=workers)
+        futures = {executor.submit(_render_chart, name, data, file_path): (name, digest)
+                   for name, data, file_path, digest in jobs}
+        pending = {name for name, _ in futures.values()}
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            for future in as_completed(futures, timeout=timeout):
+                name, digest = futures[future]
+                pending.discard(name)
+                try:
+                    future.result()
+                    manifest[name] = digest
+                except Exception as e:
+                    print(f"⚠️ 绘制图表 {name} 失败: {e}")
+                    paths.pop(name, None)
+        except TimeoutError:
+            print(f"⏱️ 绘制图表已到截止时间，放弃: {'、'.join(sorted(pending))}")
+            for name in pending:
+                paths.pop(name, None)
+        finally:
+            # 解释器退出时进程池会等待所有已提交的任务，到期后取消尚未开始的绘制
+            executor.shutdown(wait=False, cancel_futures=True)
+        write_json(manifest, manifest_path, indent=1)
+
+    print(f"🖼️ 图表: 共 {len(chart_data)} 张，重新绘制 {len(jobs)} 张，命中缓存 {len(chart_data) - len(jobs)} 张")
+    return paths
+
+def chart_markdown(paths, name, date):
+    """图表在 Hugo 文章中的 Markdown；文章位于 /posts/<slug>/，用相对路径兼容站点的子路径 baseURL"""
+    if name not in paths:
+        return ""
+    return f"![{CHART_TITLES[name]}](../../charts/{date}/{name}.png)\n\n"
+
+if __name__ == "__main__":
+    from data_archive import load_local_csv
+
+    parser = argparse.ArgumentParser(description="根据 data/<date> 的缓存数据绘制报告图表和公众号封面")
+    parser.add_argument('--date', required=True)
+    parser.add_argument('--data-root', default='data')
+    parser.add_argument('--out-dir', default=CHART_DIR)
+    args = parser.parse_args()
+
+    def load(name):
+        return load_local_csv(f"{args.data_root}/{args.date}/{name}_{args.date}.csv")
+
+    data = build_chart_data(args.date, index_df=load('index'), all_stocks_df=load('A_stock'),
+                            zt_pool_df=load('zt_pool'), dt_pool_df=load('dt_pool'),
+                            concept_summary_df=load('concept_summary'), top_amount_stocks_df=load('top_amount_stocks'))
+    print(render_charts(data, args.date, out_dir=args.out_dir))
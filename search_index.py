@@ -0,0 +1,155 @@
+import argparse
+import glob
+import os
+
+from data_archive import code_key, list_available_dates, load_local_csv, read_json, write_json
+
+
+SEARCH_DIR = 'static/search'    # Hugo 会把 static/ 原样发布到站点根目录，前端按需请求分片
+CONCEPT_SHARDS = 16
+
+# 个股出现的栏目，按位编码：(栏目名, 文件名前缀, 代码列, 名称列)
+SECTIONS = [
+    ('成交额榜', 'top_amount_stocks', '代码', '名称'),
+    ('涨停', 'zt_pool', '代码', '名称'),
+    ('炸板', 'zb_pool', '代码', '名称'),
+    ('跌停', 'dt_pool', '代码', '名称'),
+    ('龙虎榜', 'lhb', '股票代码', '股票名称'),
+    ('大额异动池', 'watchlist1', '代码', '名称'),
+    ('风口涨停池', 'watchlist2', '代码', '名称'),
+    ('全市场评分池', 'watchlist3', '代码', '名称'),
+    ('热门概念', 'concept_cons', '代码', '名称'),
+]
+
+
+def stock_shard(code):
+    """个股分片：按代码前三位（同一交易所/板块的代码落在同一分片）"""
+    return code[:3]
+
+def concept_shard(concept):
+    """概念分片：字符编码之和取模，前端可用同样的方式计算"""
+    return sum(ord(c) for c in concept) % CONCEPT_SHARDS
+
+def extract_day(date, data_root='data'):
+    """
+    提取某个交易日的检索数据
+    返回 ({代码: 栏目位掩码}, {代码: 名称}, [当日前五概念板块])
+    """
+    save_dir = f"{data_root}/{date}"
+    flags, names = {}, {}
+    for bit, (_, prefix, code_col, name_col) in enumerate(SECTIONS):
+        files = [f"{save_dir}/{prefix}_{i}_{date}.csv" for i in range(5)] if prefix == 'concept_cons' \
+            else [f"{save_dir}/{prefix}_{date}.csv"]
+        for file_path in files:
+            df = load_local_csv(file_path)
+            if df is None or df.empty or code_col not in df.columns:
+                continue
+            codes = code_key(df[code_col])
+            for code, name in zip(codes, df[name_col] if name_col in df.columns else codes):
+                flags[code] = flags.get(code, 0) | (1 << bit)
+                if isinstance(name, str):
+                    names[code] = name
+
+    concept_df = load_local_csv(f"{save_dir}/concept_summary_{date}.csv")
+    concepts = [] if concept_df is None else concept_df['板块名称'].dropna().astype(str).tolist()
+    return flags, names, concepts
+
+def _load_shards(pattern):
+    return {os.path.splitext(os.path.basename(p))[0]: read_json(p, {}) for p in glob.glob(pattern)}
+
+def update_search_index(date, data_root='data', out_dir=SEARCH_DIR, force=False):
+    """
+    把某个交易日的数据增量写入检索索引，只改写当天涉及的分片：
+    - meta.json: 日期表（倒排表中以下标引用日期）、栏目名、概念名列表
+    - names.json: [[代码, 名称], ...]，用于按名称检索
+    - stocks/<代码前三位>.json: {代码: [[日期下标, 栏目位掩码], ...]}
+    - concepts/<分片号>.json: {概念: [日期下标, ...]}
+    已收录的日期默认跳过；force=True 时先撤销该日期旧的条目再重新写入
+    """
+    meta = read_json(f"{out_dir}/meta.json", {'dates': [], 'sections': [s[0] for s in SECTIONS], 'concepts': []})
+    if date in meta['dates'] and not force:
+        print(f"🔎 检索索引已包含 {date}，跳过")
+        return 0
+
+    flags, names, concepts = extract_day(date, data_root=data_root)
+    if not flags and not concepts:
+        print(f"⚠️ {date} 没有可用于检索的数据")
+        return 0
+
+    if date in meta['dates']:
+        date_id = meta['dates'].index(date)
+        # 重新处理：所有分片中撤销该日期的条目（只在同日重跑时发生）
+        stock_shards = _load_shards(f"{out_dir}/stocks/*.json")
+        concept_shards = _load_shards(f"{out_dir}/concepts/*.json")
+        dirty_stock = set()
+        dirty_concept = set()
+        for shard, postings in stock_shards.items():
+            for code, entries in postings.items():
+                kept = [e for e in entries if e[0] != date_id]
+                if len(kept) != len(entries):
+                    postings[code] = kept
+                    dirty_stock.add(shard)
+        for shard, postings in concept_shards.items():
+            for concept, date_ids in postings.items():
+                if date_id in date_ids:
+                    date_ids.remove(date_id)
+                    dirty_concept.add(shard)
+    else:
+        date_id = len(meta['dates'])
+        meta['dates'].append(date)
+        stock_shards, concept_shards = {}, {}
+        dirty_stock, dirty_concept = set(), set()
+
+    for code, mask in flags.items():
+        shard = stock_shard(code)
+        if shard not in stock_shards:
+            stock_shards[shard] = read_json(f"{out_dir}/stocks/{shard}.json", {})
+        stock_shards[shard].setdefault(code, []).append([date_id, mask])
+        dirty_stock.add(shard)
+
+    for concept in concepts:
+        shard = str(concept_shard(concept))
+        if shard not in concept_shards:
+            concept_shards[shard] = read_json(f"{out_dir}/concepts/{shard}.json", {})
+        concept_shards[shard].setdefault(concept, []).append(date_id)
+        dirty_concept.add(shard)
+        if concept not in meta['concepts']:
+            meta['concepts'].append(concept)
+
+    for shard in dirty_stock:
+        postings = {code: sorted(entries) for code, entries in stock_shards[shard].items() if entries}
+        write_json(postings, f"{out_dir}/stocks/{shard}.json")
+    for shard in dirty_concept:
+        postings = {concept: sorted(ids) for concept, ids in concept_shards[shard].items() if ids}
+        write_json(postings, f"{out_dir}/concepts/{shard}.json")
+
+    known_names = dict(read_json(f"{out_dir}/names.json", []))
+    if any(known_names.get(code) != name for code, name in names.items()):
+        known_names.update(names)
+        write_json(sorted(known_names.items()), f"{out_dir}/names.json")
+    write_json(meta, f"{out_dir}/meta.json")
+
+    print(f"🔎 检索索引已更新 {date}: 个股 {len(flags)} 只，概念 {len(concepts)} 个，"
+          f"改写分片 {len(dirty_stock) + len(dirty_concept)} 个")
+    return len(dirty_stock) + len(dirty_concept)
+
+def build_search_index(data_root='data', out_dir=SEARCH_DIR):
+    """逐日补齐尚未收录的交易日（首次运行时即为全量构建）"""
+    return sum(update_search_index(date, data_root=data_root, out_dir=out_dir)
+               for date in list_available_dates(data_root))
+
+def refresh_search_index(date, data_root='data', out_dir=SEARCH_DIR):
+    """流水线使用：先补齐所有尚未收录的交易日（如已归档的历史日期），再强制重新处理当天（当天重跑时数据可能更新）"""
+    build_search_index(data_root=data_root, out_dir=out_dir)
+    return update_search_index(date, data_root=data_root, out_dir=out_dir, force=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="增量更新站点的分片检索索引 static/search/")
+    parser.add_argument('--date', help='只处理该交易日（会覆盖已收录的同一日期）；默认补齐所有未收录的交易日')
+    parser.add_argument('--data-root', default='data')
+    parser.add_argument('--out-dir', default=SEARCH_DIR)
+    args = parser.parse_args()
+    if args.date:
+        update_search_index(args.date, data_root=args.data_root, out_dir=args.out_dir, force=True)
+    else:
+        build_search_index(data_root=args.data_root, out_dir=args.out_dir)
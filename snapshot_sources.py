@@ -0,0 +1,131 @@
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from ak_cache import cached_call, invalidate, refresh_call
+
+
+# 全市场快照的统一字段（以东方财富 stock_zh_a_spot_em 为准），外加 数据源 列
+CANONICAL_COLUMNS = [
+    '代码', '名称', '最新价', '涨跌幅', '涨跌额', '成交量', '成交额', '振幅', '最高', '最低', '今开', '昨收',
+    '量比', '换手率', '市盈率-动态', '市净率', '总市值', '流通市值', '涨速', '5分钟涨跌', '60日涨跌幅', '年初至今涨跌幅',
+]
+SOURCE_COLUMN = '数据源'
+MIN_ROWS = 1000     # 少于该行数的响应视为残缺数据
+
+
+def _normalize_em(df):
+    """东方财富：字段本身就是统一格式"""
+    return df.drop(columns=['序号'], errors='ignore')
+
+def _normalize_sina(df):
+    """新浪：代码带 sh/sz/bj 前缀，成交量单位为股（东财为手），没有量比、换手率、市值、60日涨跌幅等字段"""
+    df = df.copy()
+    df['代码'] = df['代码'].astype(str).str[-6:]
+    df['成交量'] = pd.to_numeric(df['成交量'], errors='coerce') / 100
+    prev_close = pd.to_numeric(df['昨收'], errors='coerce').replace(0, np.nan)
+    df['振幅'] = ((pd.to_numeric(df['最高'], errors='coerce') - pd.to_numeric(df['最低'], errors='coerce'))
+                  / prev_close * 100).round(2)
+    return df
+
+# 数据源适配器：接口名、展示名、字段映射函数、该源缺失（统一后为 NaN）的字段
+SOURCES = {
+    'em': {
+        'label': '东方财富',
+        'endpoint': 'stock_zh_a_spot_em',
+        'normalize': _normalize_em,
+        'missing': [],
+    },
+    'sina': {
+        'label': '新浪',
+        'endpoint': 'stock_zh_a_spot',
+        'normalize': _normalize_sina,
+        'missing': ['量比', '换手率', '市盈率-动态', '市净率', '总市值', '流通市值',
+                    '涨速', '5分钟涨跌', '60日涨跌幅', '年初至今涨跌幅'],
+    },
+}
+
+
+def normalize_snapshot(df, source):
+    """将某个数据源的原始快照映射到统一字段，缺失字段显式填 NaN，并记录数据源"""
+    adapter = SOURCES[source]
+    df = adapter['normalize'](df)
+    for col in CANONICAL_COLUMNS:
+        if col not in df.columns:
+            df[col] = np.nan
+    df = df[CANONICAL_COLUMNS].copy()
+    for col in CANONICAL_COLUMNS[2:]:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df[SOURCE_COLUMN] = source
+    df.attrs['missing_fields'] = list(adapter['missing'])
+    return df
+
+def missing_fields(df):
+    """返回快照中该数据源不提供的字段（依据 数据源 列，CSV 缓存读回后同样可用）"""
+    if df is None or SOURCE_COLUMN not in df.columns or df.empty:
+        return []
+    source = df[SOURCE_COLUMN].iloc[0]
+    return list(SOURCES[source]['missing']) if source in SOURCES else []
+
+def fetch_snapshot(source, use_cache=True):
+    """
+    从单个数据源抓取并统一字段，残缺响应抛出异常
+    use_cache=False 时跳过缓存直接请求上游（结果仍写入缓存），用于轮询间隔短于缓存有效期的盘中模式
+    """
+    raw_df = (cached_call if use_cache else refresh_call)(SOURCES[source]['endpoint'])
+    if raw_df is None or len(raw_df) < MIN_ROWS:
+        invalidate(SOURCES[source]['endpoint'])
+        raise ValueError(f"{SOURCES[source]['label']} 返回数据残缺: {0 if raw_df is None else len(raw_df)} 行")
+    return normalize_snapshot(raw_df, source)
+
+def fetch_snapshot_hedged(primary='em', secondary='sina', hedge_after=3.0, timeout=60.0, use_cache=True):
+    """
+    对冲请求：先请求主数据源，若 hedge_after 秒内未返回（或已失败）则同时请求备用数据源，
+    采用最先返回的有效结果；都失败或超过 timeout 时抛出 RuntimeError
+    工作线程为守护线程，落后的请求不会阻塞主流程和进程退出
+    use_cache 透传给 fetch_snapshot
+    """
+    results = queue.Queue()
+
+    def worker(source):
+        started = time.perf_counter()
+        try:
+            results.put((source, fetch_snapshot(source, use_cache=use_cache), None, time.perf_counter() - started))
+        except Exception as e:
+            results.put((source, None, e, time.perf_counter() - started))
+
+    def launch(source):
+        threading.Thread(target=worker, args=(source,), daemon=True).start()
+
+    start = time.monotonic()
+    deadline = start + timeout
+    launch(primary)
+    pending, hedged, errors = 1, False, {}
+
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        wait_until = deadline if hedged else min(deadline, start + hedge_after)
+        try:
+            source, df, error, elapsed = results.get(timeout=max(0.0, wait_until - now))
+        except queue.Empty:
+            source = None
+        if source is not None:
+            pending -= 1
+            if error is None:
+                print(f"✅ {SOURCES[source]['label']} 快照返回 {len(df)} 行，耗时 {elapsed:.1f}s")
+                return df
+            errors[source] = error
+            print(f"⚠️ {SOURCES[source]['label']} 快照抓取失败 ({elapsed:.1f}s): {error}")
+        if not hedged and (source is not None or time.monotonic() >= start + hedge_after):
+            print(f"⏱️ 主数据源 {hedge_after:.0f}s 内未返回有效数据，发起备用数据源 {SOURCES[secondary]['label']} 的对冲请求")
+            launch(secondary)
+            pending, hedged = pending + 1, True
+        elif hedged and pending == 0:
+            break
+
+    raise RuntimeError(f"所有数据源均未在 {timeout:.0f}s 内返回有效快照: {errors or '超时'}")
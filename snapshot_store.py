@@ -0,0 +1,192 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from data_archive import load_archived_csv
+
+
+MAX_DECIMALS = 4            # 定点整数编码允许的最大小数位数
+# 原始行号（按代码排序前的位置），用于还原原始行顺序
+ORDER_COLUMN = '_原序'
+
+_CODE_PATTERN = re.compile(r'^([A-Za-z]*)(\d{6})$')
+
+
+def _scale_column(values):
+    """
+    float64 数组 -> (列, 小数位数)：找到最小的 k 使 round(v * 10^k) / 10^k 与原值逐位相等且放大后落在 int32 范围内，
+    按取值范围存为 int16 或 int32（缺失值用该类型的最小值作哨兵）；找不到时原样保留 float64，小数位数为 None
+    """
+    mask = np.isnan(values)
+    present = values[~mask]
+    for scale in range(MAX_DECIMALS + 1):
+        scaled = np.round(present * 10 ** scale)
+        peak = np.abs(scaled).max(initial=0)
+        if peak >= -np.iinfo(np.int32).min:
+            break
+        if np.array_equal(scaled / 10 ** scale, present):
+            dtype = np.int16 if peak < -np.iinfo(np.int16).min else np.int32
+            packed = np.full(len(values), np.iinfo(dtype).min, dtype=dtype)
+            packed[~mask] = scaled.astype(dtype)
+            return packed, scale
+    return values, None
+
+def _unscale_column(packed, scale):
+    """定点整数列还原为 float64：一次除法，哨兵还原为 NaN"""
+    values = packed.astype(np.float64) / 10 ** scale
+    values[packed == np.iinfo(packed.dtype).min] = np.nan
+    return values
+
+
+class CompactSnapshot:
+    """
+    全市场快照的紧凑内存表示
+    - 代码编码为 int32（新浪源的 sh/sz/bj 前缀单独存为 category 列）
+    - 名称为 category 类型
+    - 有限位小数的数值列（价格、涨跌幅、比率等）按 10^k 放大存为 int16/int32 定点整数，还原只需一次除法且逐位精确；
+      放大后超出 int32 的列（成交额、市值）保留 float64
+    - 序号列为 1..n 时去掉（还原时重建），按代码排序，代码 -> 行号通过二分查找得到，无需额外的字典
+    - 记录原始行号（int32），to_frame 按原始顺序还原
+    """
+
+    def __init__(self, frame, date=None, dtypes=None, scales=None):
+        self.frame = frame          # 紧凑格式的 DataFrame，按 代码 升序
+        self.date = date
+        self.scales = scales or {}  # 定点整数列 -> 小数位数
+        # 原始列顺序及其 dtype，用于无损还原；序号在 dtypes 中但不在 frame 中时表示还原时重建
+        self.dtypes = dtypes or {c: frame[c].dtype for c in frame.columns if c not in ('_前缀', ORDER_COLUMN)}
+        self._codes = frame['代码'].to_numpy()
+
+    @classmethod
+    def from_frame(cls, df, date=None):
+        """从 fetch_all_stock_data 返回的 pandas 快照构造"""
+        dtypes = df.dtypes.to_dict()
+        if '序号' in df.columns and np.array_equal(df['序号'].to_numpy(), np.arange(1, len(df) + 1)):
+            df = df.drop(columns='序号')
+        compact = pd.DataFrame(index=df.index)
+        compact[ORDER_COLUMN] = np.arange(len(df), dtype=np.int32)
+        scales = {}
+
+        parts = df['代码'].astype(str).str.extract(_CODE_PATTERN)
+        if parts[1].isna().any():
+            bad = df.loc[parts[1].isna(), '代码'].head(3).tolist()
+            raise ValueError(f"无法编码的股票代码: {bad}")
+        compact['代码'] = parts[1].astype(np.int32)
+        if (parts[0] != '').any():
+            compact['_前缀'] = parts[0].str.lower().astype('category')
+
+        for col in dtypes:
+            if col == '代码' or col not in df.columns:
+                continue
+            series = df[col]
+            if pd.api.types.is_integer_dtype(series):
+                compact[col] = pd.to_numeric(series, downcast='integer')
+            elif pd.api.types.is_numeric_dtype(series):
+                compact[col], scale = _scale_column(series.to_numpy(dtype=np.float64))
+                if scale is not None:
+                    scales[col] = scale
+            else:
+                compact[col] = series.astype('category')
+
+        compact.sort_values('代码', kind='stable', inplace=True)
+        compact.reset_index(drop=True, inplace=True)
+        return cls(compact, date=date, dtypes=dtypes, scales=scales)
+
+    @classmethod
+    def from_csv(cls, file_path, date=None):
+        """从本地快照 CSV（A_stock_<date>.csv）构造，散装文件不存在时回退到归档，都没有时返回 None"""
+        if os.path.exists(file_path):
+            df = pd.read_csv(file_path, dtype={'代码': str})
+        else:
+            df = load_archived_csv(file_path)
+            if df is None:
+                return None
+        return cls.from_frame(df, date=date)
+
+    def to_frame(self):
+        """还原为构造时的 pandas 快照：原始行顺序、列顺序和 dtype，字符串代码，源数据有序号时重建序号"""
+        frame = self.frame.sort_values(ORDER_COLUMN).reset_index(drop=True)
+        df = pd.DataFrame(index=frame.index)
+        codes = frame['代码'].astype(str).str.zfill(6)
+        if '_前缀' in frame.columns:
+            codes = frame['_前缀'].astype(str) + codes
+        for col, dtype in self.dtypes.items():
+            if col == '序号' and col not in frame.columns:
+                df[col] = pd.Series(range(1, len(df) + 1), index=df.index).astype(dtype)
+                continue
+            if col == '代码':
+                df[col] = codes.astype(dtype)
+            elif col in self.scales:
+                df[col] = _unscale_column(frame[col].to_numpy(), self.scales[col])
+            else:
+                df[col] = frame[col].astype(dtype)
+        return df
+
+    def row_of(self, code):
+        """返回代码对应的行号，不存在时返回 None"""
+        match = _CODE_PATTERN.match(str(code))
+        if match is None:
+            return None
+        key = int(match.group(2))
+        pos = int(np.searchsorted(self._codes, key))
+        if pos < len(self._codes) and self._codes[pos] == key:
+            return pos
+        return None
+
+    def rows_of(self, codes):
+        """批量查找行号，返回 (行号数组, 是否命中数组)"""
+        keys = pd.Series(codes, dtype=str).str.extract(_CODE_PATTERN)[1].fillna(-1).astype(np.int64).to_numpy()
+        if len(self._codes) == 0:
+            return np.zeros(len(keys), dtype=np.intp), np.zeros(len(keys), dtype=bool)
+        pos = np.searchsorted(self._codes, keys)
+        pos = np.minimum(pos, len(self._codes) - 1)
+        found = self._codes[pos] == keys
+        return pos, found
+
+    def lookup(self, code):
+        """按代码取单只股票的一行（pandas Series），不存在时返回 None"""
+        pos = self.row_of(code)
+        if pos is None:
+            return None
+        row = self.frame.iloc[pos].drop(ORDER_COLUMN)
+        for col, scale in self.scales.items():
+            row[col] = _unscale_column(np.array([row[col]]), scale)[0]
+        return row
+
+    def memory_usage(self):
+        """紧凑表示占用的字节数"""
+        return int(self.frame.memory_usage(deep=True).sum())
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __repr__(self):
+        return f"CompactSnapshot(date={self.date}, rows={len(self)}, memory={self.memory_usage() / 1024:.0f} KB)"
+
+
+def share_name_categories(snapshots):
+    """让多日快照共用同一份 名称 类别表：各日的股票名称高度重合，共享后每日只需保存 int16 编码"""
+    names = pd.Index([])
+    for snapshot in snapshots:
+        names = names.union(snapshot.frame['名称'].cat.categories)
+    name_dtype = pd.CategoricalDtype(names)
+    for snapshot in snapshots:
+        snapshot.frame['名称'] = snapshot.frame['名称'].astype(name_dtype)
+    return name_dtype
+
+
+def load_snapshots(dates, data_root='data'):
+    """批量加载多日快照为 CompactSnapshot，返回 {date: CompactSnapshot}，缺失的日期跳过"""
+    snapshots = {}
+    for date in dates:
+        file_path = f"{data_root}/{date}/A_stock_{date}.csv"
+        snapshot = CompactSnapshot.from_csv(file_path, date=date)
+        if snapshot is None:
+            print(f"⚠️ 本地快照不存在: {file_path}")
+            continue
+        snapshots[date] = snapshot
+    if snapshots:
+        share_name_categories(snapshots.values())
+    return snapshots
@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+
+
+# 阶段状态
+OK = '✅ 完成'
+TIMEOUT = '⏱️ 超时'
+FAILED = '❌ 失败'
+EMPTY = '⚠️ 无数据'
+SKIPPED = '⏭️ 跳过'
+
+STAGE_GRACE = 5     # 传给阶段函数的截止时间比阶段预算提前的秒数，留给阶段保存部分结果并返回
+
+
+class StageRunner:
+    """
+    带截止时间的流水线执行器，保证每日任务按时结束
+    - 每个阶段在守护线程中运行，超过自己的时间预算即放弃等待并改用 fallback 继续；
+      Python 线程无法被强制终止，超时阶段的线程会被丢弃（结果作废）
+    - 守护线程本身不阻止进程退出，但阶段内部启动的线程池/进程池在解释器退出时会先跑完所有已提交的任务；
+      这类阶段要通过 deadline_arg 接收截止时间，到期后自行取消尚未开始的任务（executor.shutdown(cancel_futures=True)）
+    - 整条流水线有总预算，单个阶段的实际预算不超过剩余时间，总预算用完后其余阶段直接跳过
+    - 阶段抛出异常、或依赖的上游结果缺失（为 None）时同样使用 fallback
+    - 很多阶段函数内部捕获异常后返回 None（或全为 None 的元组），这种结果同样记为降级并使用 fallback
+    """
+
+    def __init__(self, total_budget=None):
+        self.total_budget = total_budget
+        self.deadline = None if total_budget is None else time.monotonic() + total_budget
+        self.records = []   # [(阶段, 状态, 耗时, 说明), ...]
+
+    def remaining(self):
+        """流水线剩余的总时间（秒），没有总预算时为 None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    @staticmethod
+    def _fallback(fallback):
+        return fallback() if callable(fallback) else fallback
+
+    @staticmethod
+    def _is_empty(value):
+        """阶段结果为 None，或是元素全为 None / 空列表的元组（如 (None, None, None)、([], [])）"""
+        if value is None:
+            return True
+        return isinstance(value, tuple) and len(value) > 0 and \
+            all(item is None or (isinstance(item, list) and not item) for item in value)
+
+    def run(self, name, func, *args, budget=60, fallback=None, requires=None, ignore_deadline=False, deadline_arg=None,
+            **kwargs):
+        """
+        运行一个阶段并返回其结果；超时、失败、依赖缺失或结果为空时返回 fallback（可调用对象则返回其调用结果），
+        fallback 为 None 时空结果原样返回
+        requires: {上游名称: 上游结果}，任意一个为 None 时跳过本阶段
+        ignore_deadline: 不受总预算限制，只受自身预算限制（用于抓取阶段用完总预算后仍必须执行的发布阶段）
+        deadline_arg: 阶段函数接收截止时间（time.monotonic() 时刻）的参数名，截止时间比预算提前 STAGE_GRACE 秒
+        """
+        missing = [dep for dep, value in (requires or {}).items() if value is None]
+        if missing:
+            return self._skip(name, f"缺少上游数据: {'、'.join(missing)}", fallback)
+
+        remaining = None if ignore_deadline else self.remaining()
+        if remaining is not None:
+            if remaining <= 0:
+                return self._skip(name, "总时间预算已用完", fallback)
+            budget = min(budget, remaining)
+
+        result = {}
+
+        def target():
+            try:
+                result['value'] = func(*args, **kwargs)
+            except BaseException as e:
+                result['error'] = e
+
+        print(f"▶️ 阶段 [{name}] 开始（预算 {budget:.0f}s）")
+        started = time.monotonic()
+        if deadline_arg is not None:
+            kwargs[deadline_arg] = started + max(budget - STAGE_GRACE, budget / 2)
+        thread = threading.Thread(target=target, name=f"stage-{name}", daemon=True)
+        thread.start()
+        thread.join(budget)
+        elapsed = time.monotonic() - started
+
+        if thread.is_alive():
+            print(f"⏱️ 阶段 [{name}] 超过预算 {budget:.0f}s，放弃等待，使用缓存/部分数据继续")
+            self.records.append((name, TIMEOUT, elapsed, f"超过 {budget:.0f}s 预算"))
+            return self._fallback(fallback)
+        if 'error' in result:
+            print(f"❌ 阶段 [{name}] 失败: {result['error']}")
+            self.records.append((name, FAILED, elapsed, str(result['error'])[:200]))
+            return self._fallback(fallback)
+        if self._is_empty(result['value']):
+            print(f"⚠️ 阶段 [{name}] 未返回数据")
+            self.records.append((name, EMPTY, elapsed, "阶段未返回数据（内部已处理异常或无可用数据）"))
+            fallback_value = self._fallback(fallback)
+            return result['value'] if fallback_value is None else fallback_value
+        self.records.append((name, OK, elapsed, ''))
+        return result['value']
+
+    def _skip(self, name, reason, fallback):
+        print(f"⏭️ 阶段 [{name}] 跳过: {reason}")
+        self.records.append((name, SKIPPED, 0.0, reason))
+        return self._fallback(fallback)
+
+    @property
+    def degraded(self):
+        """未正常完成的阶段名称"""
+        return [name for name, status, _, _ in self.records if status != OK]
+
+    def summary(self):
+        """汇总各阶段的状态和耗时（Markdown 表格），并写入 GitHub Actions 的作业摘要"""
+        lines = [
+            "### 🧭 流水线阶段汇总",
+            "",
+            "| 阶段 | 状态 | 耗时(s) | 说明 |",
+            "| --- | --- | --- | --- |",
+        ]
+        lines += [f"| {name} | {status} | {elapsed:.1f} | {note.replace('|', '/')} |"
+                  for name, status, elapsed, note in self.records]
+        if self.degraded:
+            lines += ["", f"⚠️ 未正常完成的阶段: {'、'.join(self.degraded)}"]
+        text = "\n".join(lines) + "\n"
+
+        print("-" * 30)
+        print(text)
+        print("-" * 30)
+        summary_path = os.getenv("GITHUB_STEP_SUMMARY")
+        if summary_path:
+            with open(summary_path, 'a', encoding='utf-8') as f:
+                f.write(text)
+        return text
@@ -0,0 +1,293 @@
+import argparse
+import glob
+import hashlib
+import os
+
+import pandas as pd
+
+from concept_index import ConceptIndex
+from data_archive import code_key, list_available_dates, load_local_csv, read_json, write_json
+
+
+HISTORY_DIR = 'data/stock_history'     # dates.json + 按代码前三位分片的 <分片>.json
+MANIFEST_FILE = 'data/stock_pages_manifest.json'
+PAGES_DIR = 'content/stocks'
+MAX_CONCEPT_BOARDS = 8      # 页面上最多展示的所属概念数
+
+
+def _records(df, code_col='代码', name_col='名称'):
+    """DataFrame -> [(代码, 名称, 行字典), ...]，文件缺失时返回空列表"""
+    if df is None or df.empty or code_col not in df.columns:
+        return []
+    df = df.copy()
+    df[code_col] = code_key(df[code_col])
+    return [(row[code_col], row.get(name_col), row) for row in df.to_dict('records')]
+
+def _clean(value):
+    """NaN -> None，numpy 标量 -> Python 标量，便于写入 JSON"""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+def extract_day_events(date, data_root='data', concept_index=None):
+    """
+    从某个交易日的缓存数据中提取个股事件，返回 {代码: {'名称': ..., 事件字段: ...}}
+    - 成交额榜：排名、涨跌幅、成交额
+    - 涨停池：连板数、涨停统计；炸板池：炸板
+    - 龙虎榜：上榜原因
+    - 概念：当日前五概念板块中所属的板块；有倒排索引时附上该股全部所属概念
+    """
+    save_dir = f"{data_root}/{date}"
+
+    def load(name):
+        return load_local_csv(f"{save_dir}/{name}_{date}.csv")
+
+    events = {}
+
+    def event(code, name):
+        day = events.setdefault(code, {})
+        if name is not None and not (isinstance(name, float) and pd.isna(name)):
+            day['名称'] = name
+        return day
+
+    for code, name, row in _records(load('top_amount_stocks')):
+        day = event(code, name)
+        day['成交额榜'] = int(row['序号'])
+        day['涨跌幅'] = _clean(row.get('涨跌幅'))
+        day['成交额'] = _clean(row.get('成交额(亿元)'))
+
+    for code, name, row in _records(load('zt_pool')):
+        day = event(code, name)
+        day['涨停'] = _clean(row.get('涨停统计')) or '涨停'
+        day['连板数'] = _clean(row.get('连板数'))
+        day.setdefault('涨跌幅', _clean(row.get('涨跌幅')))
+
+    for code, name, _ in _records(load('zb_pool')):
+        event(code, name)['炸板'] = True
+
+    for code, name, row in _records(load('lhb'), code_col='股票代码', name_col='股票名称'):
+        day = event(code, name)
+        reasons = day.setdefault('龙虎榜', [])
+        reason = _clean(row.get('指标'))
+        if reason and reason not in reasons:
+            reasons.append(reason)
+
+    for i in range(5):
+        for code, name, row in _records(load(f'concept_cons_{i}')):
+            day = event(code, name)
+            board = _clean(row.get('所属板块'))
+            if board and board not in day.setdefault('热门概念', []):
+                day['热门概念'].append(board)
+
+    if concept_index is not None:
+        for code, day in events.items():
+            boards = concept_index.boards_of(code)
+            if boards:
+                day['所属概念'] = boards
+
+    return events
+
+def history_shard(code):
+    """历史记录分片：按代码前三位（与检索索引的个股分片一致）"""
+    return code[:3]
+
+def _shard_files(history_dir):
+    return [p for p in glob.glob(f"{history_dir}/*.json") if os.path.basename(p) != 'dates.json']
+
+def load_history(history_dir=HISTORY_DIR, shards=None):
+    """
+    读取历史记录 {'dates': [...], 'stocks': {代码: {日期: 事件}}}
+    shards 为 None 时读取全部分片，否则只读取给定的分片
+    """
+    dates = read_json(f"{history_dir}/dates.json", [])
+    if shards is None:
+        paths = _shard_files(history_dir)
+    else:
+        paths = [f"{history_dir}/{shard}.json" for shard in shards]
+    stocks = {}
+    for path in paths:
+        stocks.update(read_json(path, {}))
+    return {'dates': dates, 'stocks': stocks}
+
+def save_history(history, codes, history_dir=HISTORY_DIR, rewrite_all=False):
+    """
+    只改写 codes 所在的分片（分片中已没有股票时删除该文件），返回改写的分片数
+    rewrite_all=True 时同时改写/清理磁盘上已有的全部分片（用于重建）
+    """
+    dirty = {history_shard(code) for code in codes}
+    if rewrite_all:
+        dirty |= {os.path.splitext(os.path.basename(p))[0] for p in _shard_files(history_dir)}
+    by_shard = {}
+    for code, days in history['stocks'].items():
+        if history_shard(code) in dirty:
+            by_shard.setdefault(history_shard(code), {})[code] = days
+    for shard in dirty:
+        shard_path = f"{history_dir}/{shard}.json"
+        if shard in by_shard:
+            write_json(by_shard[shard], shard_path)
+        elif os.path.exists(shard_path):
+            os.remove(shard_path)
+    write_json(history['dates'], f"{history_dir}/dates.json")
+    return len(dirty)
+
+def update_history(history, day_events):
+    """
+    把若干交易日的事件 {日期: {代码: 事件}} 合并进历史记录
+    重新处理某个日期时先撤销该日期旧的事件（需要已读取全部分片），返回事件有变化的股票代码集合
+    """
+    touched = set()
+    stocks = history['stocks']
+    for date, new_events in sorted(day_events.items()):
+        old_codes = {code for code, days in stocks.items() if date in days} if date in history['dates'] else set()
+        for code in old_codes | set(new_events):
+            days = stocks.setdefault(code, {})
+            old = days.pop(date, None)
+            new = new_events.get(code)
+            if new is not None:
+                days[date] = new
+            elif not days:
+                del stocks[code]
+            if old != new:
+                touched.add(code)
+        if date not in history['dates']:
+            history['dates'].append(date)
+    history['dates'].sort()
+    return touched
+
+def _fmt(value, suffix=''):
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f"{value:.2f}{suffix}"
+    return f"{value}{suffix}"
+
+def _fmt_date(date):
+    return f"{date[:4]}-{date[4:6]}-{date[6:]}"
+
+def render_stock_page(code, days):
+    """根据某只股票的历史事件生成 Hugo 页面（内容只由历史数据决定，不含生成时间，便于比较哈希）"""
+    dates = sorted(days, reverse=True)
+    name = next((days[d]['名称'] for d in dates if days[d].get('名称')), code)
+    latest = dates[0]
+
+    turnover_days = [d for d in dates if '成交额榜' in days[d]]
+    limit_up_days = [d for d in dates if '涨停' in days[d]]
+    lhb_days = [d for d in dates if '龙虎榜' in days[d]]
+    max_streak = max((int(days[d].get('连板数') or 0) for d in limit_up_days), default=0)
+    concepts = next((days[d]['所属概念'] for d in dates if days[d].get('所属概念')), [])
+    hot_concepts = {}
+    for d in dates:
+        for board in days[d].get('热门概念', []):
+            hot_concepts[board] = hot_concepts.get(board, 0) + 1
+
+    rows = []
+    for d in dates:
+        day = days[d]
+        limit_up = day.get('涨停', '')
+        if day.get('炸板'):
+            limit_up = f"{limit_up} 炸板".strip()
+        rows.append(
+            f"| {_fmt_date(d)} | {_fmt(day.get('成交额榜'))} | {_fmt(day.get('涨跌幅'), '%')} | "
+            f"{_fmt(day.get('成交额'))} | {limit_up} | {'；'.join(day.get('龙虎榜', []))} | "
+            f"{'、'.join(day.get('热门概念', []))} |"
+        )
+
+    concept_line = '、'.join(concepts[:MAX_CONCEPT_BOARDS]) or '暂无'
+    if len(concepts) > MAX_CONCEPT_BOARDS:
+        concept_line += f" 等 {len(concepts)} 个"
+    hot_line = '、'.join(f"{board}（{n} 次）" for board, n in sorted(hot_concepts.items(), key=lambda x: -x[1])) or '暂无'
+
+    return f"""---
+title: "{code} {name}"
+date: {_fmt_date(latest)}
+tags: ["个股档案"]
+summary: "成交额榜 {len(turnover_days)} 次，涨停 {len(limit_up_days)} 次，龙虎榜 {len(lhb_days)} 次"
+draft: false
+---
+
+### 📌 概况
+- **上榜天数**: {len(dates)}（首次 {_fmt_date(dates[-1])}，最近 {_fmt_date(latest)}）
+- **成交额前二十**: {len(turnover_days)} 次
+- **涨停**: {len(limit_up_days)} 次，最高 {max_streak} 连板
+- **龙虎榜**: {len(lhb_days)} 次
+- **所属概念**: {concept_line}
+- **进入前五概念板块**: {hot_line}
+
+### 🗓️ 历史记录
+
+| 日期 | 成交额排名 | 涨跌幅 | 成交额 | 涨停 | 龙虎榜 | 热门概念 |
+|:-----|-----:|-----:|-----:|:-----|:-----|:-----|
+{chr(10).join(rows)}
+"""
+
+def render_index_page():
+    return """---
+title: "个股档案"
+summary: "每只曾进入成交额榜、涨停池、龙虎榜或热门概念板块的个股的历史记录"
+---
+"""
+
+def write_if_changed(file_path, content, manifest, key):
+    """内容哈希与清单一致且文件存在时跳过写入，返回是否写入"""
+    digest = hashlib.sha1(content.encode('utf-8')).hexdigest()
+    if manifest.get(key) == digest and os.path.exists(file_path):
+        return False
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    manifest[key] = digest
+    return True
+
+def generate_stock_pages(date=None, data_root='data', pages_dir=PAGES_DIR, history_dir=HISTORY_DIR,
+                         manifest_path=MANIFEST_FILE, rebuild=False):
+    """
+    增量生成个股档案页：
+    - 只解析尚未处理过的交易日（以及 date 指定的交易日，当天重跑时数据可能更新）
+    - 历史记录按代码前三位分片，只读取、改写当天涉及的分片（同一日期重新处理时才读取全部分片）
+    - 只重新渲染事件有变化的股票，渲染结果与清单中的内容哈希一致时不写文件
+    - rebuild=True 时从全部交易日重建历史，并重新渲染所有股票（仍然只写入内容变化的页面）
+    """
+    available = list_available_dates(data_root)
+    processed = [] if rebuild else read_json(f"{history_dir}/dates.json", [])
+    manifest = read_json(manifest_path, {})
+
+    dates = [d for d in available if d not in processed]
+    if date is not None and date in available and date not in dates:
+        dates.append(date)
+    concept_index = ConceptIndex.load()
+    day_events = {d: extract_day_events(d, data_root=data_root, concept_index=concept_index) for d in dates}
+
+    if rebuild:
+        history = {'dates': [], 'stocks': {}}
+    elif any(d in processed for d in dates):
+        history = load_history(history_dir)
+    else:
+        history = load_history(history_dir, {history_shard(code) for events in day_events.values() for code in events})
+    touched = update_history(history, day_events)
+    if rebuild:
+        touched = (set(history['stocks']) | set(manifest)) - {'_index'}
+
+    os.makedirs(pages_dir, exist_ok=True)
+    written = int(write_if_changed(f"{pages_dir}/_index.md", render_index_page(), manifest, '_index'))
+    for code in sorted(touched):
+        page_path = f"{pages_dir}/{code}.md"
+        if code not in history['stocks']:
+            if os.path.exists(page_path):
+                os.remove(page_path)
+            manifest.pop(code, None)
+            written += 1
+            continue
+        written += write_if_changed(page_path, render_stock_page(code, history['stocks'][code]), manifest, code)
+
+    shards = save_history(history, touched, history_dir=history_dir, rewrite_all=rebuild)
+    write_json(manifest, manifest_path)
+    print(f"📚 个股档案: 处理交易日 {len(dates)} 个，事件变化的股票 {len(touched)} 只，"
+          f"写入页面 {written} 个，改写历史分片 {shards} 个")
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="根据 data/ 中的每日数据增量生成个股档案页 content/stocks/<代码>.md")
+    parser.add_argument('--date', help='强制重新处理的交易日 YYYYMMDD（默认只处理尚未处理过的交易日）')
+    parser.add_argument('--data-root', default='data')
+    parser.add_argument('--rebuild', action='store_true', help='从全部交易日重建历史记录')
+    args = parser.parse_args()
+    generate_stock_pages(date=args.date, data_root=args.data_root, rebuild=args.rebuild)
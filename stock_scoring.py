@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from data_archive import code_key
+
+
+# 全市场多因子评分的默认权重：连续因子按全市场分位数 (0~1) 归一化，布尔因子取 0/1
+DEFAULT_SCORE_WEIGHTS = {
+    '成交额': 0.25,       # 成交额排名
+    '量比': 0.15,
+    '换手率': 0.10,
+    '涨速': 0.05,
+    '涨跌幅': 0.10,
+    '60日涨跌幅': 0.05,
+    '涨停': 0.15,         # 是否在涨停池
+    '概念': 0.15,         # 是否属于涨幅靠前的概念板块
+}
+
+FLAG_FACTORS = ['涨停', '概念']
+
+
+def score_stocks(df, limit_up_codes=(), concept_codes=(), weights=None, top_k=20):
+    """
+    对全市场快照做多因子加权评分，返回得分最高的 top_k 只个股（按得分降序）
+    - 连续因子一次性做分位数归一化，综合得分是一次矩阵乘法
+    - 选取前 K 使用 np.argpartition (O(n))，只对选出的 K 只排序
+    - 快照中缺失或全为空的因子（如新浪源没有量比/换手率）权重按 0 处理
+    """
+    weights = dict(DEFAULT_SCORE_WEIGHTS if weights is None else weights)
+
+    # 剔除 ST 与停牌（无成交）个股
+    tradable = df[~df['名称'].str.contains('ST', case=False, na=False) & (df['成交额'].fillna(0) > 0)]
+    codes = code_key(tradable['代码']).to_numpy()
+
+    missing = [f for f in weights if f not in FLAG_FACTORS and (f not in tradable.columns or tradable[f].isna().all())]
+    if missing:
+        print(f"⚠️ 快照缺少评分因子，按 0 权重处理: {missing}")
+    continuous = [f for f in weights if f not in FLAG_FACTORS and f not in missing]
+
+    factors = tradable[continuous].apply(pd.to_numeric, errors='coerce').rank(pct=True).fillna(0.0)
+    factors['涨停'] = np.isin(codes, code_key(list(limit_up_codes)).to_numpy()).astype(float)
+    factors['概念'] = np.isin(codes, code_key(list(concept_codes)).to_numpy()).astype(float)
+
+    columns = continuous + [f for f in FLAG_FACTORS if f in weights]
+    score = factors[columns].to_numpy() @ np.array([weights[c] for c in columns])
+
+    k = min(top_k, len(score))
+    if k == 0:
+        return tradable.iloc[0:0].assign(综合得分=[])
+    top_idx = np.argpartition(-score, k - 1)[:k]
+    top_idx = top_idx[np.argsort(-score[top_idx], kind='stable')]
+
+    result = tradable.iloc[top_idx].copy()
+    result['涨停'] = factors['涨停'].to_numpy()[top_idx].astype(bool)
+    result['概念'] = factors['概念'].to_numpy()[top_idx].astype(bool)
+    result['综合得分'] = np.round(score[top_idx], 4)
+    return result.reset_index(drop=True)